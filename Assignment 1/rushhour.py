@@ -87,44 +87,47 @@ class Board:
 
         return next_moves
 
+    def delta(self, pos, horizontal, cell):
+        axis = 1 if horizontal else 0
+        if cell[axis] < min(pos)[axis]:
+            return cell[axis] - min(pos)[axis]
+        return cell[axis] - max(pos)[axis]
+
+    def moves(self):
+        for car in self.cars:
+            pos = self.car_position(car)
+            horizontal = self.move_horizontal(car)
+            for cell in self.possible_moves(pos, horizontal):
+                yield car, self.delta(pos, horizontal, cell)
+
+    def apply(self, move):
+        car, delta = move
+        pos = self.car_position(car)
+        horizontal = self.move_horizontal(car)
+        for p in pos:
+            self.board_state[p[0]][p[1]] = " "
+        for p in pos:
+            if horizontal:
+                self.board_state[p[0]][p[1] + delta] = car
+            else:
+                self.board_state[p[0] + delta][p[1]] = car
+
+    def undo(self, move):
+        car, delta = move
+        self.apply((car, -delta))
+
     def next(self):
         possible_boards = []
-        for car in self.cars:
-            next_moves = self.next_for_car(car)
-            for next_move in next_moves:
-                possible_boards.append(next_move)
+        for move in self.moves():
+            self.apply(move)
+            possible_boards.append(self.clone())
+            self.undo(move)
         if (len(possible_boards) > 0):
             self.print(possible_boards)
 
-    def distance(self, p1, p2):
-        P = (p2[0] - p1[0], p2[1] - p1[1])
-        P = (P[0]) + (P[1])
-        return P
-
     def move(self, car, move_to):
-        new_pos = []
-        current_pos = self.car_position(car)
-        move_horizontal = self.move_horizontal(car)
-
-        car_head = max(current_pos)
-        car_tail = min(current_pos)
-
-        L = self.distance(car_head, move_to)
-        U = self.distance(car_tail, move_to)
-
-        move_distance = U if (abs(U) < abs(L)) else L
-
-        if (move_horizontal):
-            for p in current_pos:
-                new_pos.append((p[0], p[1]+move_distance))
-                self.board_state[p[0]][p[1]] = " "
-        else:
-            for p in current_pos:
-                new_pos.append((p[0] + move_distance, p[1]))
-                self.board_state[p[0]][p[1]] = " "
-
-        for p in new_pos:
-            self.board_state[p[0]][p[1]] = car
+        pos = self.car_position(car)
+        self.apply((car, self.delta(pos, self.move_horizontal(car), move_to)))
 
     def clone(self):
         state = copy.deepcopy(self.board_state)
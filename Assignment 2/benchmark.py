@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+from rushhour import Board, SearchStats, read_boards, SOLVED, UNSOLVABLE
+
+# ----------------------------------------------------------------------------------
+# Benchmark Modes - name: (search method, keyword arguments)
+# ----------------------------------------------------------------------------------
+MODES = {
+    "bfs": (Board.bfs, {}),
+    "astar": (Board.Astar, {}),
+    "astar-blocking": (Board.Astar, {"heuristic": "blocking"}),
+    "astar-pdb": (Board.Astar, {"heuristic": "pdb"}),
+    "idastar": (Board.IDAstar, {}),
+}
+# IDA* solves every corpus board optimally, but the 35- and 51-move boards take
+# about 20 s, over the default 10 s timeout, and the 30-move one about 9 s. It
+# only runs when asked for with -m
+DEFAULT_MODES = ["bfs", "astar", "astar-blocking", "astar-pdb"]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(HERE, "puzzles.txt")
+DEFAULT_OUTPUT = os.path.join(HERE, "..", "bench_output.txt")
+
+
+# FUNCTION - Runs one mode on one board, returns the result of the last repetition
+def measure(board_state, mode, warmup, repeat, timeout):
+    search, options = MODES[mode]
+    options = dict(options, timeout=timeout)
+
+    for _ in range(warmup):
+        search(Board(board_state), **options)
+
+    times = []
+    for _ in range(repeat):
+        board = Board(board_state)
+        start = time.perf_counter()
+        result = search(board, **options)
+        times.append(time.perf_counter() - start)
+
+    # Memory is traced in its own run since tracemalloc distorts the timings
+    traced = search(Board(board_state), stats=SearchStats(memory=True), **options)
+
+    return {
+        "board": board_state,
+        "mode": mode,
+        "status": result.status,
+        "depth": result.depth,
+        "expanded": result.expanded,
+        "generated": result.stats.generated,
+        "time": round(statistics.median(times), 6),
+        "time_min": round(min(times), 6),
+        "peak_memory": traced.stats.peak_memory,
+    }
+
+
+# FUNCTION - Returns the regressions of results against a baseline run. Depth,
+# expansions and memory are only compared when both runs finished the search:
+# a stopped run expands more nodes the faster the code gets.
+def compare(results, baseline, threshold, time_floor):
+    previous = {(entry["board"], entry["mode"]): entry for entry in baseline["results"]}
+    regressions = []
+
+    for entry in results:
+        before = previous.get((entry["board"], entry["mode"]))
+        if before is None:
+            continue
+        if before["status"] == SOLVED and entry["status"] != SOLVED:
+            regressions.append((entry, "status", before["status"], entry["status"]))
+            continue
+        finished = before["status"] in (SOLVED, UNSOLVABLE) \
+            and entry["status"] == before["status"]
+        if finished and before["depth"] is not None and entry["depth"] is not None \
+                and entry["depth"] > before["depth"]:
+            regressions.append((entry, "depth", before["depth"], entry["depth"]))
+        if finished and entry["expanded"] > before["expanded"] * (1 + threshold):
+            regressions.append((entry, "expanded", before["expanded"], entry["expanded"]))
+        # The fastest repetition is the least noisy measure of the code itself
+        if entry["time_min"] > before["time_min"] * (1 + threshold) \
+                and entry["time_min"] - before["time_min"] > time_floor:
+            regressions.append((entry, "time", before["time_min"], entry["time_min"]))
+        if finished and before["peak_memory"] \
+                and entry["peak_memory"] > before["peak_memory"] * (1 + threshold):
+            regressions.append((entry, "peak_memory", before["peak_memory"], entry["peak_memory"]))
+
+    return regressions
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(
+        description="Run every solver mode over the benchmark corpus.")
+    parser.add_argument("-c", "--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("-m", "--modes", default=",".join(DEFAULT_MODES),
+                        help="comma separated modes from: " + ", ".join(MODES))
+    parser.add_argument("-w", "--warmup", type=int, default=1)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("-t", "--timeout", type=float, default=10.0,
+                        help="seconds allowed per search")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("-b", "--baseline", default=None,
+                        help="earlier output to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative slowdown before failing")
+    parser.add_argument("--time-floor", type=float, default=0.01,
+                        help="ignore slowdowns smaller than this many seconds")
+    options = parser.parse_args(arguments)
+
+    modes = options.modes.split(",")
+    for mode in modes:
+        if mode not in MODES:
+            parser.error("unknown mode " + mode)
+
+    with open(options.corpus) as corpus:
+        boards = [board_state for _, board_state in read_boards(corpus)]
+
+    results = []
+    for board_state in boards:
+        for mode in modes:
+            entry = measure(board_state, mode, options.warmup, options.repeat,
+                            options.timeout)
+            results.append(entry)
+            print("%-14s %-10s depth %-4s expanded %-8d %9.4fs  %s" % (
+                mode, entry["status"], entry["depth"], entry["expanded"],
+                entry["time"], board_state))
+
+    report = {
+        "python": sys.version.split()[0],
+        "warmup": options.warmup,
+        "repeat": options.repeat,
+        "timeout": options.timeout,
+        "results": results,
+    }
+    with open(options.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print("Results written to", os.path.normpath(options.output))
+
+    if options.baseline is not None:
+        with open(options.baseline) as baseline:
+            regressions = compare(results, json.load(baseline),
+                                  options.threshold, options.time_floor)
+        for entry, metric, before, after in regressions:
+            print("REGRESSION %s %s: %s -> %s  %s" % (
+                entry["mode"], metric, before, after, entry["board"]))
+        if len(regressions) > 0:
+            sys.exit(1)
+        print("No regressions against", options.baseline)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
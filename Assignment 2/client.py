@@ -0,0 +1,51 @@
+# Client for "python3 rushhour.py serve": sends one rushhour.py command line to
+# the running server and prints its output, without importing the solver.
+#
+#   python3 client.py astar "<board>" --level summary
+#
+# Exits with 2 when no server is listening or the server refuses the command
+# (it only runs read-only searches), so callers can fall back to running
+# rushhour.py directly.
+import os
+import sys
+import json
+import socket
+
+SERVER_SOCKET = os.environ.get("RUSHHOUR_SOCKET", "/tmp/rushhour.sock")
+SERVER_PORT = os.environ.get("RUSHHOUR_PORT")
+NO_SERVER = 2
+
+
+def connect():
+    if SERVER_PORT:
+        return socket.create_connection(("127.0.0.1", int(SERVER_PORT)))
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(SERVER_SOCKET)
+    return connection
+
+
+# FUNCTION - Sends one command line and returns the server's reply
+def request(arguments, timeout=None):
+    message = {"id": 0, "argv": arguments}
+    if timeout is not None:
+        message["timeout"] = timeout
+    with connect() as connection, connection.makefile("rw") as stream:
+        stream.write(json.dumps(message) + "\n")
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+if __name__ == "__main__":
+    timeout = os.environ.get("RUSHHOUR_TIMEOUT")
+    try:
+        response = request(sys.argv[1:], float(timeout) if timeout else None)
+    except (OSError, ValueError):
+        sys.exit(NO_SERVER)
+
+    if response["status"] == "ok":
+        sys.stdout.write(response["output"])
+    elif response["status"] == "refused":
+        sys.exit(NO_SERVER)
+    else:
+        sys.stderr.write(json.dumps(response) + "\n")
+        sys.exit(1)
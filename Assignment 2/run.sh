@@ -1,6 +1,13 @@
 #!/bin/sh
+# Ask a running "python3 rushhour.py serve" first, start rushhour.py otherwise
+python3 client.py "$@"
+status=$?
+if [ "$status" -ne 2 ]; then
+	exit $status
+fi
+
 if [ "$#" -gt 1 ]; then
-	python3 rushhour.py "$1" "$2"
+	python3 rushhour.py "$@"
 else
 	python3 rushhour.py "$1"
 fi
@@ -1,191 +1,312 @@
+import os
+import io
 import sys
-import copy
-import string
+import json
+import hashlib
+import mmap
+import time
+import array
+import heapq
 import random
+import struct
+import sqlite3
+import asyncio
+import argparse
+import functools
+import itertools
+import tracemalloc
+import collections
+import multiprocessing
+import concurrent.futures
+
+# ----------------------------------------------------------------------------------
+# Board Geometry
+# ----------------------------------------------------------------------------------
+SIZE = 6
+EMPTY = " "
+EXIT_ROW = 2
+FIELD_BITS = 3
+FIELD_MASK = (1 << FIELD_BITS) - 1
+
+
+# FUNCTION - Returns the occupancy bit of a cell
+def cell_bit(row, col):
+    return 1 << (row * SIZE + col)
+
+
+# FUNCTION - Returns the occupancy mask of a car placed at offset
+def car_mask(horizontal, length, lane, offset):
+    if horizontal:
+        return ((1 << length) - 1) << (lane * SIZE + offset)
+    mask = 0
+    for k in range(length):
+        mask |= cell_bit(offset + k, lane)
+    return mask
+
+
+GOAL_MASK = cell_bit(EXIT_ROW, 4) | cell_bit(EXIT_ROW, 5)
+CAR_NAMES = "abcdefghijklmnopqrstuvwxyz"
+
+
+# ----------------------------------------------------------------------------------
+# Car Class - Fixed metadata of one car, built once at parse time
+# ----------------------------------------------------------------------------------
+class Car:
+    __slots__ = ("name", "horizontal", "length", "lane", "shift", "masks", "cells")
+
+    def __init__(self, name, horizontal, length, lane, index):
+        self.name = name
+        self.horizontal = horizontal
+        self.length = length
+        self.lane = lane
+        # Bit position of the car's offset field in Board.positions
+        self.shift = index * FIELD_BITS
+        # Occupancy mask for every offset the car can take
+        self.masks = tuple([car_mask(horizontal, length, lane, offset)
+                            for offset in range(SIZE - length + 1)])
+        # Occupancy bit of every cell along the car's lane
+        self.cells = tuple([cell_bit(lane, k) if horizontal else cell_bit(k, lane)
+                            for k in range(SIZE)])
+
+    # FUNCTION - Returns the current offset of the car in a positions field
+    def offset(self, positions):
+        return (positions >> self.shift) & FIELD_MASK
+
+    # FUNCTION - Returns the cells covered by the car at offset
+    def position(self, offset):
+        if self.horizontal:
+            return [(self.lane, offset + k) for k in range(self.length)]
+        return [(offset + k, self.lane) for k in range(self.length)]
+
+    # OVERRIDE - Equals operator
+    def __eq__(self, obj):
+        if not (isinstance(obj, Car)):
+            return False
+        return (self.name, self.horizontal, self.length, self.lane, self.shift) == \
+            (obj.name, obj.horizontal, obj.length, obj.lane, obj.shift)
+
+    # OVERRIDE - Hash function
+    def __hash__(self):
+        return hash((self.name, self.horizontal, self.length, self.lane, self.shift))
+
 
 # ----------------------------------------------------------------------------------
 # Board Class
 # ----------------------------------------------------------------------------------
 class Board:
-    def __init__(self, board_state, cars=[]):
-        self.board_state = []
-        self.cars = cars
-        self.id = ''.join(random.choices(
-            string.ascii_uppercase + string.digits, k=6))
+    '''
+    The grid is packed into two integers:
+    occupied  - 36 bit mask with bit (row * 6 + col) set for every filled cell
+    positions - one 3 bit offset field per car (column for horizontal cars,
+                row for vertical cars), located by Car.shift
+    The car table is built at parse time and shared by every board derived
+    from the same puzzle, so the positions field alone is the canonical state
+    key of a board.
+    '''
+
+    def __init__(self, board_state):
+        self.cars = []
+        self.table = ()
+        self.by_name = {}
+        self.occupied = 0
+        self.positions = 0
 
         if (isinstance(board_state, str)):
             self.parse_state(board_state)
 
         if (isinstance(board_state, list)):
-            self.board_state = board_state.copy()
+            self.parse_state("|".join(["".join(row) for row in board_state]))
 
     # FUNCTION - Parse boardstate and cars
     def parse_state(self, board_state):
         board_state = board_state.split('|')
-        for i in range(6):
-            self.board_state.append(list(board_state[i]))
-            for c in list(board_state[i]):
-                self.cars.append(c)
-        self.cars = list(set(self.cars))
-        self.cars.remove(" ")
-        self.cars.sort(reverse=True)
+        cells = {}
+        for i in range(SIZE):
+            for j, c in enumerate(board_state[i]):
+                if c != EMPTY:
+                    cells.setdefault(c, []).append((i, j))
+        self.cars = sorted(cells, reverse=True)
+
+        table = []
+        for index, name in enumerate(self.cars):
+            position = cells[name]
+            horizontal = position[0][0] == position[-1][0]
+            if horizontal:
+                lane, offset = position[0]
+            else:
+                offset, lane = position[0]
+            car = Car(name, horizontal, len(position), lane, index)
+            table.append(car)
+            self.occupied |= car.masks[offset]
+            self.positions |= offset << car.shift
+        self.table = tuple(table)
+        self.by_name = {car.name: car for car in self.table}
+
+    # FUNCTION - Returns a board sharing this car table with new bit fields
+    def derive(self, positions, occupied):
+        board = Board.__new__(Board)
+        board.cars = self.cars
+        board.table = self.table
+        board.by_name = self.by_name
+        board.positions = positions
+        board.occupied = occupied
+        return board
+
+    # FUNCTION - Returns the canonical state key of the board
+    def key(self):
+        return self.positions
+
+    # FUNCTION - Returns the board of this puzzle with the given state key
+    def from_key(self, key):
+        occupied = 0
+        for car in self.table:
+            occupied |= car.masks[car.offset(key)]
+        return self.derive(key, occupied)
+
+    # FUNCTION - Returns the board as a 6x6 grid of characters
+    @property
+    def board_state(self):
+        grid = [[EMPTY] * SIZE for _ in range(SIZE)]
+        for car in self.table:
+            for i, j in car.position(car.offset(self.positions)):
+                grid[i][j] = car.name
+        return grid
+
+    # FUNCTION - Returns the board in the parse_state string format
+    def __str__(self):
+        return "|".join(["".join(row) for row in self.board_state])
+
+    # FUNCTION - Returns the board string with cars renamed a, b, c, ... in
+    # reading order (x keeps its name), equal for boards that differ only in
+    # car names
+    def canonical(self):
+        names = self.canonical_names()
+        names[EMPTY] = EMPTY
+        return "|".join(["".join([names[c] for c in row]) for row in self.board_state])
+
+    # FUNCTION - Returns the {car name: canonical name} renaming used by canonical()
+    def canonical_names(self):
+        names = {"x": "x"} if "x" in self.by_name else {}
+        letters = iter([c for c in CAR_NAMES if c != "x"])
+        for row in self.board_state:
+            for c in row:
+                if c != EMPTY and c not in names:
+                    names[c] = next(letters)
+        return names
 
     # FUNCTION - Check if the board is in end state
     def done(self):
-        if (self.board_state[2][4] + self.board_state[2][5] == "xx"):
-            return True
-        return False
+        car = self.by_name.get("x")
+        if car is None:
+            return False
+        return car.masks[car.offset(self.positions)] & GOAL_MASK == GOAL_MASK
 
     # FUNCTION - Returns the car position in the board
     def car_position(self, car):
-        position = []
-        for i in range(len(self.board_state)):
-            for j in range(len(self.board_state[i])):
-                if self.board_state[i][j] == car:
-                    position.append((i, j))
-        return position
+        car = self.by_name[car]
+        return car.position(car.offset(self.positions))
 
     # FUNCTION - Returns true if car can move horitzonally
     def move_horizontal(self, car):
-        position = self.car_position(car)
-        car_head = position[0]
-        for pos in position:
-            if (pos[0] != car_head[0]):
-                return False
-        return True
-
-    # FUNCTION - Returns all possible moves for a car
-    def possible_moves(self, pos, horizontal):
-        possible_moves = []
-
-        if (horizontal):
-            direction = pos[0][0]
-            car_head = max(pos)[1] + 1
-            car_tail = min(pos)[1] - 1
-
-            while (car_tail > -1) and (self.board_state[direction][car_tail] == " "):
-                possible_moves.append((direction, car_tail))
-                car_tail -= 1
-
-            while (car_head < 6) and (self.board_state[direction][car_head] == " "):
-                possible_moves.append((direction, car_head))
-                car_head += 1
-
-        else:
-            direction = pos[0][1]
-            car_head = max(pos)[0] + 1
-            car_tail = min(pos)[0] - 1
-
-            while (car_tail > -1) and (self.board_state[car_tail][direction] == " "):
-                possible_moves.append((car_tail, direction))
-                car_tail -= 1
-
-            while (car_head < 6) and (self.board_state[car_head][direction] == " "):
-                possible_moves.append((car_head, direction))
-                car_head += 1
-
-        return possible_moves
+        return self.by_name[car].horizontal
+
+    # FUNCTION - Lazily yields (car, delta) descriptors for every legal slide
+    # The board may be changed with apply() while iterating as long as every
+    # apply() is matched by undo() before the next descriptor is requested
+    def moves(self):
+        for car in self.table:
+            offset = car.offset(self.positions)
+            cells = car.cells
+
+            tail = offset - 1
+            while tail > -1 and not (self.occupied & cells[tail]):
+                yield car, tail - offset
+                tail -= 1
+
+            head = offset + car.length
+            while head < SIZE and not (self.occupied & cells[head]):
+                yield car, head - offset - car.length + 1
+                head += 1
+
+    # FUNCTION - Slides a car in place by a (car, delta) descriptor
+    def apply(self, move):
+        car, delta = move
+        current = car.offset(self.positions)
+        self.occupied = self.occupied ^ car.masks[current] | car.masks[current + delta]
+        self.positions += delta << car.shift
+
+    # FUNCTION - Reverts a descriptor previously passed to apply()
+    def undo(self, move):
+        car, delta = move
+        self.apply((car, -delta))
+
+    # FUNCTION - Returns the state keys of all successors without building boards
+    def next_keys(self):
+        positions = self.positions
+        return [positions + (delta << car.shift) for car, delta in self.moves()]
 
     # FUNCTION - Returns board objects for all possible for a cars
     def next_for_car(self, car):
-        next_moves = []
-        pos = self.car_position(car)
-        hr = self.move_horizontal(car)
-        moves = self.possible_moves(pos, hr)
-
-        for move in moves:
-            B = self.clone()
-            B.move(car, move)
-            next_moves.append(B)
-
-        return next_moves
+        car = self.by_name[car]
+        possible_boards = []
+        for move in self.moves():
+            if move[0] is car:
+                self.apply(move)
+                possible_boards.append(self.clone())
+                self.undo(move)
+        return possible_boards
 
     # FUNCTION - Returns board objects for all possible for all cars
     def next(self):
         possible_boards = []
-        for car in self.cars:
-            next_moves = self.next_for_car(car)
-            for next_move in next_moves:
-                possible_boards.append(next_move)
+        for move in self.moves():
+            self.apply(move)
+            possible_boards.append(self.clone())
+            self.undo(move)
         if (len(possible_boards) > 0):
             # self.print(possible_boards)
             return possible_boards
         return None
 
-    # FUNCTION - Returns distance between two cars
-    def distance(self, p1, p2):
-        P = (p2[0] - p1[0], p2[1] - p1[1])
-        P = (P[0]) + (P[1])
-        return P
-
     # FUNCTION - Moves a card in the board
     def move(self, car, move_to):
-        new_pos = []
-        current_pos = self.car_position(car)
-        move_horizontal = self.move_horizontal(car)
-
-        car_head = max(current_pos)
-        car_tail = min(current_pos)
-
-        L = self.distance(car_head, move_to)
-        U = self.distance(car_tail, move_to)
-
-        move_distance = U if (abs(U) < abs(L)) else L
-
-        if (move_horizontal):
-            for p in current_pos:
-                new_pos.append((p[0], p[1]+move_distance))
-                self.board_state[p[0]][p[1]] = " "
+        car = self.by_name[car]
+        offset = car.offset(self.positions)
+        cell = move_to[1] if car.horizontal else move_to[0]
+        if cell < offset:
+            delta = cell - offset
         else:
-            for p in current_pos:
-                new_pos.append((p[0] + move_distance, p[1]))
-                self.board_state[p[0]][p[1]] = " "
-
-        for p in new_pos:
-            self.board_state[p[0]][p[1]] = car
+            delta = cell - offset - car.length + 1
+        self.apply((car, delta))
 
     # FUNCTION - Returns the clone of the board
-    def clone(self, board_state=None, cars=None):
+    def clone(self):
+        return self.derive(self.positions, self.occupied)
 
-        if board_state == None:
-            board_state = self.board_state
-        if cars == None:
-            cars = self.cars
-
-        state = copy.deepcopy(board_state)
-        clone = Board(state, cars)
-        return clone
+    # FUNCTION - Returns the boards drawn side by side
+    def render(self, boards=None):
+        if not boards:
+            boards = [self]
+        return render_row(boards)
 
     # FUNCTION - Prints the boards in rows
-    def print(self, boards=[]):
-        # SETUP
-        if len(boards) == 0:
-            boards.append(self)
-        width = len(boards)
-        height = 6
-        # PRINT
-        print(" ------ " * width)
-        for i in range(height):
-            for board in boards:
-                bar = " " if (i == 2) else "|"
-                print("|"+"".join(board.board_state[i]), end=bar)
-            print("")
-        print(" ------ " * width)
+    def print(self, boards=None):
+        sys.stdout.write(self.render(boards))
 
     # OVERRIDE - Equals operator
     def __eq__(self, obj):
         if not (isinstance(obj, Board)):
             return False
 
-        if (self.board_state == obj.board_state):
-            if (self.cars == obj.cars):
+        if (self.positions == obj.positions):
+            if (self.table == obj.table):
                 return True
 
         return False
 
     # OVERRIDE - Hash function
     def __hash__(self):
-        return hash((self.id))
+        return hash(self.positions)
 
     '''
     PATH ALGORITHMS
@@ -195,68 +316,288 @@ class Board:
     # ----------------------------------------------------------------------------------
     # Random Walk
     # ----------------------------------------------------------------------------------
-    def random(self, N=10):
-
-        path = Path()
-        pathAdd = [self.clone()]
+    def random(self, N=10, stats=None):
+        stats = SearchStats.begin(stats, "random")
+        current = self.clone()
+        pathAdd = [current.clone()]
 
         for _ in range(N):
-            current = pathAdd[-1].clone()
-
             if (current.done()):
                 break
 
-            possible_moves = current.next()
+            possible_moves = list(current.moves())
+            stats.generated += len(possible_moves)
+            stats.expand(1)
+            stats.lap(SUCCESSORS)
 
-            if (possible_moves != None):
+            if (len(possible_moves) > 0):
                 random_pick = random.randint(0, len(possible_moves)-1)
-                random_pick = possible_moves[random_pick]
-                pathAdd.append(random_pick)
+                current.apply(possible_moves[random_pick])
+                pathAdd.append(current.clone())
             else:
                 break
 
-        path.addPath(pathAdd)
-        path.last()
+        status = SOLVED if current.done() else UNSOLVED
+        return SearchResult(pathAdd, stats.finish(), status)
+
+    # ----------------------------------------------------------------------------------
+    # Monte Carlo Random Walks
+    # ----------------------------------------------------------------------------------
+    def random_walks(self, walkers=1000, N=1000, seed=0, stats=None):
+        stats = SearchStats.begin(stats, "walks")
+        engine = WalkEngine(self)
+        seeds = walker_seeds(seed, walkers)
+        hitting = engine.run(seeds, N, stats)
+        stats.finish()
+
+        solved = hitting >= 0
+        shortest = None
+        if solved.any():
+            best = int(numpy.argmin(numpy.where(solved, hitting, N + 1)))
+            moves = engine.replay(seeds[best:best + 1], int(hitting[best]))
+            current = self.clone()
+            path = [current.clone()]
+            for move in moves:
+                current.apply(move)
+                path.append(current.clone())
+            shortest = SearchResult(path, stats)
+
+        return WalkReport(walkers, N, hitting, shortest)
 
     # ----------------------------------------------------------------------------------
     # Breadth First Search - BFS
     # ----------------------------------------------------------------------------------
-    def bfs(self):
-        visited = []
-        queue = [self.clone()]
-        path = Path()
+    def bfs(self, timeout=None, stats=None, nodes=None, memory=None):
+        stats = SearchStats.begin(stats, "bfs")
+        start = self.clone()
+        queue = collections.deque([start])
+        parents = {start.key(): None}
+        budget = SearchBudget(timeout, nodes, memory)
 
         while(len(queue) > 0):
             # Pop first node
-            current = queue.pop(0)
+            current = queue.popleft()
+            stats.lap(FRONTIER)
 
-            # Add Path
-            path.add(current, True)
-            
             # Path Found
             if current.done():
+                return SearchResult(trace_path(parents, current), stats.finish(), bound=1.0)
+
+            # Give up once the budget is spent, heading for the frontier board
+            # that looks closest to the goal
+            if budget.spent(stats):
+                queue.appendleft(current)
+                return budget.partial(parents, queue, stats, self.blocking_heuristic)
+
+            stats.expand(len(queue))
+
+            # Perform BFS, linking each new board to its parent
+            children = []
+            for move in current.moves():
+                current.apply(move)
+                key = current.key()
+                if key not in parents:
+                    parents[key] = current
+                    children.append(current.clone())
+                else:
+                    stats.duplicates += 1
+                current.undo(move)
+            stats.generated += len(children)
+            stats.lap(SUCCESSORS)
+
+            queue.extend(children)
+            stats.lap(FRONTIER)
+
+        return SearchResult([], stats.finish())
+
+    # ----------------------------------------------------------------------------------
+    # Bidirectional BFS - From the start board and from every solved board
+    # ----------------------------------------------------------------------------------
+    def goal_states(self):
+        x = self.by_name.get("x")
+        if x is None or not x.horizontal or x.lane != EXIT_ROW:
+            return []
+        goal = SIZE - x.length
+        keys = []
+
+        # Cars sharing a lane can never pass each other, so each lane keeps
+        # its start order: place the cars lane by lane, front to back
+        lanes = {}
+        for car in self.table:
+            lanes.setdefault((car.horizontal, car.lane), []).append(car)
+        order = []
+        for cars in lanes.values():
+            order.extend(sorted(cars, key=lambda car: car.offset(self.positions)))
+
+        # Place the cars one by one on every free offset behind the car
+        # before them in the lane; x only goes on the exit cells
+        def place(index, occupied, key, lane, end):
+            if index == len(order):
+                keys.append(key)
+                return
+            car = order[index]
+            if (car.horizontal, car.lane) != lane:
+                end = 0
+            offsets = [goal] if car is x else range(end, SIZE - car.length + 1)
+            for offset in offsets:
+                mask = car.masks[offset]
+                if not (occupied & mask):
+                    place(index + 1, occupied | mask, key | (offset << car.shift),
+                          (car.horizontal, car.lane), offset + car.length)
+
+        place(0, 0, 0, None, 0)
+        return keys
+
+    def bidirectional_bfs(self, timeout=None, stats=None, nodes=None, memory=None):
+        '''
+        Grows one BFS tree from the start board and one from the solved boards
+        that keep every lane's car order, always expanding a whole layer of
+        the smaller frontier.
+        Slides are reversible, so the goal side uses the same successors. The
+        first layer in which the trees touch holds the shortest path, through
+        whichever meeting board has the smallest total depth.
+        '''
+        stats = SearchStats.begin(stats, "bibfs")
+        budget = SearchBudget(timeout, nodes, memory)
+        start = self.key()
+        if self.done():
+            return SearchResult([self.clone()], stats.finish(), bound=1.0)
+
+        goals = self.goal_states()
+        # key: (link towards own root, depth) for each side
+        forward = {start: (None, 0)}
+        backward = {key: (None, 0) for key in goals}
+        forward_frontier = [start]
+        backward_frontier = goals
+        stats.lap(OTHER)
+
+        # FUNCTION - Returns the boards from the start to key along forward links
+        def forward_path(key):
+            keys = []
+            while key is not None:
+                keys.append(key)
+                key = forward[key][0]
+            keys.reverse()
+            return [self.from_key(key) for key in keys]
+
+        while(len(forward_frontier) > 0 and len(backward_frontier) > 0):
+            if len(forward_frontier) <= len(backward_frontier):
+                frontier, side, other = forward_frontier, forward, backward
+            else:
+                frontier, side, other = backward_frontier, backward, forward
+
+            next_frontier = []
+            meeting = None
+            for key in frontier:
+                if budget.spent(stats):
+                    # Head for the forward board that looks closest to the goal
+                    closest = min(forward_frontier,
+                                  key=lambda key: self.blocking_heuristic(self.from_key(key)))
+                    return SearchResult(forward_path(closest), stats.finish(), budget.status)
+                stats.expand(len(frontier))
+                depth = side[key][1] + 1
+                for child in self.from_key(key).next_keys():
+                    if child in side:
+                        stats.duplicates += 1
+                        continue
+                    stats.generated += 1
+                    side[child] = (key, depth)
+                    next_frontier.append(child)
+                    if child in other:
+                        total = depth + other[child][1]
+                        if meeting is None or total < meeting[0]:
+                            meeting = (total, child)
+            stats.lap(SUCCESSORS)
+
+            if side is forward:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+
+            if meeting is not None:
+                # Stitch start -> meeting board -> goal from both link chains
+                path = forward_path(meeting[1])
+                key = backward[meeting[1]][0]
+                while key is not None:
+                    path.append(self.from_key(key))
+                    key = backward[key][0]
+                return SearchResult(path, stats.finish(), bound=1.0)
+
+        return SearchResult([], stats.finish())
+
+    # ----------------------------------------------------------------------------------
+    # Parallel BFS - States hash distributed over worker processes
+    # ----------------------------------------------------------------------------------
+    def parallel_bfs(self, workers=None, timeout=None, stats=None, nodes=None, memory=None):
+        '''
+        Every state is owned by the worker its key hashes to, which keeps its
+        parent link and expands it. Layers run in lockstep: each worker
+        expands its frontier, sends one batch of (child, parent) keys to every
+        other worker and reads one batch back from each. Since every move
+        costs 1, the first layer holding a goal gives an optimal path, and a
+        layer in which no worker gained a state ends the search.
+        '''
+        stats = SearchStats.begin(stats, "parallel")
+        workers = workers or os.cpu_count()
+        budget = SearchBudget(timeout, nodes, memory)
+
+        inboxes = [multiprocessing.Queue() for _ in range(workers)]
+        pipes = [multiprocessing.Pipe() for _ in range(workers)]
+        processes = [multiprocessing.Process(
+            target=hash_bfs_worker, daemon=True,
+            args=(str(self), rank, workers, inboxes, pipes[rank][1]))
+            for rank in range(workers)]
+        for process in processes:
+            process.start()
+        control = [parent for parent, _ in pipes]
+
+        goal = self.key() if self.done() else None
+        status = None
+        while goal is None:
+            # The states live in the workers, so there is no partial path
+            if budget.spent(stats):
+                status = budget.status
+                break
+            for conn in control:
+                conn.send(("expand", None))
+            frontier = 0
+            for conn in control:
+                size, found, expanded, generated, duplicates = conn.recv()
+                frontier += size
+                stats.expanded += expanded
+                stats.generated += generated
+                stats.duplicates += duplicates
+                if found is not None and goal is None:
+                    goal = found
+            stats.max_frontier = max(stats.max_frontier, frontier)
+            stats.lap(SUCCESSORS)
+            if goal is None and frontier == 0:
+                status = UNSOLVABLE
                 break
-            
-            # Add to visited
-            if current not in visited:
-                visited.append(current)
-            
-            # Generate possible moves
-            possible_moves = current.next()
-
-            # Perform BFS
-            for board in possible_moves:
-                path.addChildren(current, board)
-                if (board not in visited and board not in queue):
-                    queue.append(board)
-
-        print(len(visited))
+
+        # Walk the parent links back through the owners of each state
+        path = []
+        key = goal
+        while key is not None:
+            path.append(self.from_key(key))
+            conn = control[state_owner(key, workers)]
+            conn.send(("parent", key))
+            key = conn.recv()
+        path.reverse()
+
+        for conn in control:
+            conn.send(("stop", None))
+        for process in processes:
+            process.join()
+        stats.lap(OTHER)
+
+        return SearchResult(path, stats.finish(), status, 1.0 if goal is not None else None)
 
     # ----------------------------------------------------------------------------------
     # A*
     # ----------------------------------------------------------------------------------
-    def A_cost(self, parent):
-        return parent["g"] + 1
+    def A_cost(self, g):
+        return g + 1
 
     def A_heuristic(self, board):
         position = board.car_position("x")
@@ -265,7 +606,7 @@ class Board:
     
         gap = int(goal[1][1] - position[1][1])/2
         if (gap > 0):
-            if (board.board_state[2][position[1][1]+1] != " "):
+            if (board.occupied & cell_bit(EXIT_ROW, position[1][1]+1)):
                 obstacle += 1
 
         A = abs(goal[1][1] - position[1][1])
@@ -273,66 +614,753 @@ class Board:
         heuristic = A + B + obstacle
         return(heuristic)
 
-    def A_checkNodeInList(self, node, node_list):
-        for N in node_list:
-            if (node["board"] == N["board"]):
-                if(node["f"] > N["f"]):
-                    return True
-        return False
+    # FUNCTION - Returns the heuristic function registered under name
+    def A_heuristic_function(self, name):
+        if name == "default":
+            return self.A_heuristic
+        if name == "blocking":
+            return self.blocking_heuristic
+        if name == "pdb":
+            pdb = PatternDatabase.load(self)
+            blocking = self.blocking_heuristic
+            return lambda board: max(pdb.lookup(board), blocking(board))
+        raise ValueError("unknown heuristic " + name)
+
+    def Astar(self, trace=None, timeout=None, heuristic="default", stats=None,
+              weight=1, nodes=None, memory=None):
+        stats = SearchStats.begin(stats, "astar" if weight == 1 else "wastar")
+        if trace is True:
+            trace = sys.stdout
+        admissible = heuristic in ADMISSIBLE
+        estimate = self.A_heuristic_function(heuristic)
 
-    def Astar(self):
         # Start Node
-        start = {
-            "board": self.clone(),
-            "parent": None,
-            "f": 0,
-            "g": 0,  # cost
-            "h": self.A_heuristic(self)  # heuristic
-        }
-
-        open_list = [start]
-        closed_list = []
-        path = Path()
+        start = self.clone()
+        heuristic = estimate(start)
+
+        # Open list is a heap of (f, h, order, g, board) with f = g + weight * h:
+        # ties on f prefer the node closest to the goal, then the node pushed first
+        open_list = [(weight * heuristic, heuristic, 0, 0, start)]
+        best_g = {start.key(): 0}
+        parents = {start.key(): None}
+        closed = set()
+        order = 1
+        budget = SearchBudget(timeout, nodes, memory)
+        closest = (heuristic, start)
 
         while(len(open_list) > 0):
             # Pop the node with lowest F
-            open_list = sorted(open_list, key=lambda B: B['f'])
-            currentNode = open_list.pop(0)
-            current = currentNode["board"]
+            _, h, _, g, current = heapq.heappop(open_list)
+            key = current.key()
+
+            # Skip stale entries left behind by a cheaper path
+            if g > best_g[key] or key in closed:
+                stats.duplicates += 1
+                continue
+            stats.lap(FRONTIER)
 
-            # Add to path
-            path.add(current, True)
+            # Write the path to every expanded board
+            if trace:
+                trace.write(Path().render(trace_path(parents, current)))
 
             # Path Found
             if (current.done()):
-                break
-            
-            # Add node to closed list
-            closed_boards = [B["board"] for B in closed_list]
-            if current not in closed_boards:
-                closed_list.append(currentNode)
+                bound = None
+                if admissible:
+                    # The shortest path passes an open board, and g + h of any
+                    # open board is at most its length
+                    lower = min([g] + [entry[3] + entry[1] for entry in open_list])
+                    bound = g / lower if lower > 0 else 1.0
+                return SearchResult(trace_path(parents, current), stats.finish(), bound=bound)
+
+            # Give up once the budget is spent, heading for the closest board
+            if h < closest[0]:
+                closest = (h, current)
+            if budget.spent(stats):
+                return budget.partial(parents, [closest[1]], stats)
 
-            # Generate possible moves
-            possible_moves = current.next()
+            # Add node to closed list
+            closed.add(key)
+            stats.expand(len(open_list))
+            stats.lap(OTHER)
 
             # Perform A*
-            for board in possible_moves:
-                path.addChildren(current, board)
-                cost = self.A_cost(currentNode)
-                heuristic = self.A_heuristic(board)
-                node = {
-                    "board": board,
-                    "parent": current,
-                    "f": cost + heuristic,
-                    "g": cost,
-                    "h": heuristic
-                }
-                # Add child to open list if doesn't exist f is lower
-                if not self.A_checkNodeInList(node, closed_list):
-                    if not self.A_checkNodeInList(node, open_list):
-                        open_list.append(node)
-
-        print(len(closed_list))
+            cost = self.A_cost(g)
+            children = []
+            for move in current.moves():
+                current.apply(move)
+                key = current.key()
+                if cost < best_g.get(key, cost + 1):
+                    # Cheaper path found, reopen the board if it was closed
+                    best_g[key] = cost
+                    closed.discard(key)
+                    parents[key] = current
+                    children.append(current.clone())
+                else:
+                    stats.duplicates += 1
+                current.undo(move)
+            stats.generated += len(children)
+            stats.lap(SUCCESSORS)
+
+            estimates = [estimate(board) for board in children]
+            stats.lap(HEURISTIC)
+
+            for board, heuristic in zip(children, estimates):
+                heapq.heappush(open_list, (cost + weight * heuristic, heuristic, order, cost, board))
+                order += 1
+            stats.lap(FRONTIER)
+
+        return SearchResult([], stats.finish())
+
+    def weighted_Astar(self, weight=2.0, trace=None, timeout=None, heuristic="blocking",
+                       stats=None, nodes=None, memory=None):
+        '''
+        A* ordered by g + weight * h. It expands far fewer boards than A* and
+        with an admissible heuristic its path is at most weight times the
+        shortest; the bound on the result is often tighter, taken from the
+        boards still open when the goal is reached.
+        '''
+        return self.Astar(trace, timeout, heuristic, stats, weight, nodes, memory)
+
+    # ----------------------------------------------------------------------------------
+    # Beam Search
+    # ----------------------------------------------------------------------------------
+    def beam(self, width=100, heuristic="blocking", timeout=None, stats=None,
+             nodes=None, memory=None):
+        '''
+        Breadth first search that keeps only the width boards of each layer
+        that look closest to the goal. Pruned boards are never revisited, so
+        the path length has no bound and running out of boards does not prove
+        the board unsolvable.
+        '''
+        stats = SearchStats.begin(stats, "beam")
+        estimate = self.A_heuristic_function(heuristic)
+        budget = SearchBudget(timeout, nodes, memory)
+        start = self.clone()
+        parents = {start.key(): None}
+        layer = [start]
+        closest = (estimate(start), start)
+
+        while(len(layer) > 0):
+            children = []
+            for current in layer:
+                if current.done():
+                    return SearchResult(trace_path(parents, current), stats.finish())
+                if budget.spent(stats):
+                    return budget.partial(parents, [closest[1]], stats)
+                stats.expand(len(layer))
+
+                for move in current.moves():
+                    current.apply(move)
+                    key = current.key()
+                    if key not in parents:
+                        parents[key] = current
+                        children.append(current.clone())
+                    else:
+                        stats.duplicates += 1
+                    current.undo(move)
+            stats.generated += len(children)
+            stats.lap(SUCCESSORS)
+
+            scored = [(estimate(board), order, board) for order, board in enumerate(children)]
+            stats.lap(HEURISTIC)
+
+            scored = heapq.nsmallest(width, scored)
+            layer = [board for _, _, board in scored]
+            if len(scored) > 0 and scored[0][0] < closest[0]:
+                closest = (scored[0][0], scored[0][2])
+            stats.lap(FRONTIER)
+
+        return SearchResult(trace_path(parents, closest[1]), stats.finish(), UNSOLVED)
+
+    # ----------------------------------------------------------------------------------
+    # IDA*
+    # ----------------------------------------------------------------------------------
+    def blocking_heuristic(self, board):
+        '''
+        Admissible lower bound on the moves left:
+        1 for x itself, 1 for every distinct car between x and the exit, and
+        1 for every blocker that cannot leave the exit row without another
+        car moving first (only counted when those cars are not already
+        charged to another blocker, so no car is counted twice)
+        '''
+        if board.done():
+            return 0
+        x = board.by_name.get("x")
+        if x is None or not x.horizontal:
+            return 1
+
+        x_offset = x.offset(board.positions)
+        lane = 0
+        for col in range(x_offset + x.length, SIZE):
+            lane |= cell_bit(x.lane, col)
+        if not (board.occupied & lane):
+            return 1
+
+        blockers = [car for car in board.table
+                    if car.masks[car.offset(board.positions)] & lane]
+        heuristic = 1 + len(blockers)
+
+        # Cars that must move before each stuck blocker can clear the row
+        stuck = []
+        for blocker in blockers:
+            if blocker.horizontal:
+                continue
+            offset = blocker.offset(board.positions)
+            current = blocker.masks[offset]
+            needed = set()
+            free = False
+            for target in (x.lane - blocker.length, x.lane + 1):
+                if target < 0 or target + blocker.length > SIZE:
+                    continue
+                swept = 0
+                for step in range(min(offset, target), max(offset, target) + 1):
+                    swept |= blocker.masks[step]
+                swept &= ~current
+                cars = [car.name for car in board.table
+                        if car.masks[car.offset(board.positions)] & swept]
+                if len(cars) == 0:
+                    free = True
+                    break
+                needed.update(cars)
+            if not free:
+                stuck.append(needed)
+
+        charged = set()
+        for needed in sorted(stuck, key=len):
+            if charged.isdisjoint(needed):
+                charged.update(needed)
+                heuristic += 1
+
+        return heuristic
+
+    # FUNCTION - IDA* search. Within one iteration a table keeps the smallest g
+    # each state key was reached with (at most table keys), and a state reached
+    # again with no smaller g is pruned: its subtree was already searched with
+    # at least as much of the bound left.
+    def IDAstar(self, timeout=None, heuristic="blocking", stats=None, nodes=None, memory=None,
+                table=None):
+        stats = SearchStats.begin(stats, "idastar")
+        table = IDA_TABLE if table is None else table
+        bound = 1.0 if heuristic in ADMISSIBLE else None
+        estimate = self.A_heuristic_function(heuristic)
+        board = self.clone()
+        path = [board.clone()]
+        on_path = {board.key()}
+        best_g = {}
+        budget = SearchBudget(timeout, nodes, memory)
+        timed_out = False
+        closest = (estimate(board), list(path))
+
+        # Depth first search below bound, returns the smallest f that exceeded it
+        # or None once the goal is on the path
+        def search(g, limit, last_car):
+            nonlocal timed_out, closest
+            stats.lap(SUCCESSORS)
+            h = estimate(board)
+            stats.lap(HEURISTIC)
+            if h < closest[0]:
+                closest = (h, list(path))
+            if g + h > limit:
+                return g + h
+            if board.done():
+                return None
+            if budget.spent(stats):
+                timed_out = True
+                return None
+
+            stats.expand(len(path))
+            minimum = float("inf")
+            for move in board.moves():
+                # Two slides of one car in a row are never shorter than one
+                if move[0] is last_car:
+                    continue
+                board.apply(move)
+                key = board.key()
+                if key not in on_path and best_g.get(key, g + 2) > g + 1:
+                    if len(best_g) < table or key in best_g:
+                        best_g[key] = g + 1
+                    stats.generated += 1
+                    on_path.add(key)
+                    path.append(board.clone())
+                    result = search(g + 1, limit, move[0])
+                    if result is None:
+                        board.undo(move)
+                        return None
+                    minimum = min(minimum, result)
+                    path.pop()
+                    on_path.discard(key)
+                else:
+                    stats.duplicates += 1
+                board.undo(move)
+            return minimum
+
+        limit = estimate(board)
+        while True:
+            best_g.clear()
+            best_g[board.key()] = 0
+            limit = search(0, limit, None)
+            if timed_out:
+                return SearchResult(closest[1], stats.finish(), budget.status)
+            if limit is None:
+                return SearchResult(path, stats.finish(), bound=bound)
+            if limit == float("inf"):
+                return SearchResult([], stats.finish())
+
+# FUNCTION - Returns the rank of the worker that owns a state key
+def state_owner(key, workers):
+    return (((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % workers
+
+
+# FUNCTION - Worker process of Board.parallel_bfs, owns the keys hashing to rank
+def hash_bfs_worker(board_state, rank, workers, inboxes, conn):
+    board = Board(board_state)
+    parents = {}
+    frontier = []
+    if state_owner(board.key(), workers) == rank:
+        parents[board.key()] = None
+        frontier.append(board.key())
+
+    while True:
+        command, key = conn.recv()
+
+        if command == "parent":
+            conn.send(parents[key])
+
+        elif command == "stop":
+            return
+
+        elif command == "expand":
+            batches = [[] for _ in range(workers)]
+            generated = 0
+            for parent in frontier:
+                for child in board.from_key(parent).next_keys():
+                    batches[state_owner(child, workers)].append((child, parent))
+                    generated += 1
+            for peer in range(workers):
+                if peer != rank:
+                    inboxes[peer].put(batches[peer])
+
+            received = [batches[rank]]
+            for _ in range(workers - 1):
+                received.append(inboxes[rank].get())
+
+            expanded = len(frontier)
+            frontier = []
+            found = None
+            duplicates = 0
+            for batch in received:
+                for child, parent in batch:
+                    if child in parents:
+                        duplicates += 1
+                        continue
+                    parents[child] = parent
+                    frontier.append(child)
+                    if found is None and board.from_key(child).done():
+                        found = child
+            conn.send((len(frontier), found, expanded, generated - duplicates, duplicates))
+
+
+# ----------------------------------------------------------------------------------
+# Walk Engine Class - Random walks of many boards in lockstep with NumPy
+# ----------------------------------------------------------------------------------
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ALL_CELLS = (1 << (SIZE * SIZE)) - 1
+
+
+# FUNCTION - Returns one 64 bit seed per walker derived from seed
+def walker_seeds(seed, walkers):
+    if numpy is None:
+        raise ImportError("random walks need numpy (pip install numpy)")
+    return numpy.random.SeedSequence(seed).generate_state(walkers, dtype=numpy.uint64)
+
+
+# FUNCTION - Returns uniform floats in [0, 1) for each walker seed at step
+# splitmix64 of (seed, step) gives every walker its own counter based stream,
+# so a walker's path does not depend on how many walkers share the batch
+def walker_uniforms(seeds, step):
+    with numpy.errstate(over="ignore"):
+        z = seeds + numpy.uint64(step + 1) * numpy.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> numpy.uint64(30))) * numpy.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> numpy.uint64(27))) * numpy.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> numpy.uint64(31))
+    return (z >> numpy.uint64(11)).astype(numpy.float64) * (1.0 / (1 << 53))
+
+
+class WalkEngine:
+    '''
+    Every walker is one row of an offsets array (one column per car) plus a
+    uint64 occupancy mask. A slide of car c from offset f to t is legal when
+    the occupancy has no bit in swept[c, f, t], the cells the car crosses, so
+    all legal moves of all walkers come out of one masked AND per step.
+    '''
+
+    def __init__(self, board):
+        if numpy is None:
+            raise ImportError("random walks need numpy (pip install numpy)")
+        self.board = board
+        self.table = board.table
+
+        # One (car, target offset) pair per possible slide destination
+        pairs = [(index, target) for index, car in enumerate(self.table)
+                 for target in range(SIZE - car.length + 1)]
+        self.pair_car = numpy.array([index for index, _ in pairs], dtype=numpy.intp)
+        self.pair_target = numpy.array([target for _, target in pairs], dtype=numpy.int8)
+
+        self.masks = numpy.zeros((len(self.table), SIZE), dtype=numpy.uint64)
+        self.swept = numpy.full((len(pairs), SIZE), ALL_CELLS, dtype=numpy.uint64)
+        for index, car in enumerate(self.table):
+            for offset, mask in enumerate(car.masks):
+                self.masks[index, offset] = mask
+        for pair, (index, target) in enumerate(pairs):
+            car = self.table[index]
+            for offset in range(SIZE - car.length + 1):
+                if offset == target:
+                    continue
+                swept = 0
+                for step in range(min(offset, target), max(offset, target) + 1):
+                    swept |= car.masks[step]
+                self.swept[pair, offset] = swept & ~car.masks[offset]
+
+        x = board.by_name.get("x")
+        self.x = self.table.index(x) if x is not None and x.horizontal \
+            and x.lane == EXIT_ROW else None
+        self.goal = SIZE - 2 if self.x is None else SIZE - x.length
+
+    # FUNCTION - Returns (offsets, occupancy) arrays of walkers at the start board
+    def start(self, walkers):
+        offsets = numpy.array([car.offset(self.board.positions) for car in self.table],
+                              dtype=numpy.int8)
+        offsets = numpy.tile(offsets, (walkers, 1))
+        occupied = numpy.full(walkers, self.board.occupied, dtype=numpy.uint64)
+        return offsets, occupied
+
+    # FUNCTION - Advances the walkers one step, returns the chosen pair per walker
+    def step(self, seeds, offsets, occupied, step):
+        current = offsets[:, self.pair_car]
+        swept = self.swept[numpy.arange(len(self.pair_car)), current]
+        legal = (swept & occupied[:, None]) == 0
+        count = legal.sum(axis=1)
+
+        pick = (walker_uniforms(seeds, step) * count).astype(numpy.int64)
+        choice = (legal.cumsum(axis=1) <= pick[:, None]).sum(axis=1)
+        choice = numpy.minimum(choice, len(self.pair_car) - 1)
+
+        rows = numpy.arange(len(seeds))
+        car = self.pair_car[choice]
+        target = self.pair_target[choice]
+        moving = count > 0
+        before = offsets[rows, car].astype(numpy.intp)
+        occupied[moving] = (occupied[moving] ^ self.masks[car, before][moving]) \
+            | self.masks[car, target.astype(numpy.intp)][moving]
+        offsets[rows[moving], car[moving]] = target[moving]
+        return choice, moving
+
+    # FUNCTION - Runs every walker for up to N steps, returns steps to goal or -1
+    # Each step of each walker still on the way counts as one expansion in stats
+    def run(self, seeds, N, stats=None):
+        walkers = len(seeds)
+        offsets, occupied = self.start(walkers)
+        hitting = numpy.full(walkers, -1, dtype=numpy.int64)
+        if self.x is None:
+            return hitting
+        hitting[offsets[:, self.x] == self.goal] = 0
+        active = numpy.flatnonzero(hitting < 0)
+
+        for step in range(N):
+            if len(active) == 0:
+                break
+            sub_offsets = offsets[active]
+            sub_occupied = occupied[active]
+            _, moving = self.step(seeds[active], sub_offsets, sub_occupied, step)
+            offsets[active] = sub_offsets
+            occupied[active] = sub_occupied
+
+            done = sub_offsets[:, self.x] == self.goal
+            hitting[active[done]] = step + 1
+            if stats is not None:
+                stats.expanded += len(active)
+                stats.max_frontier = max(stats.max_frontier, len(active))
+                stats.lap(SUCCESSORS)
+            active = active[moving & ~done]
+
+        return hitting
+
+    # FUNCTION - Replays one walker for steps, returns its (car, delta) moves
+    def replay(self, seeds, steps):
+        offsets, occupied = self.start(1)
+        current = self.board.clone()
+        moves = []
+        for step in range(steps):
+            choice, _ = self.step(seeds, offsets, occupied, step)
+            car = self.table[int(self.pair_car[choice[0]])]
+            move = (car, int(self.pair_target[choice[0]]) - car.offset(current.positions))
+            current.apply(move)
+            moves.append(move)
+        return moves
+
+
+# ----------------------------------------------------------------------------------
+# Walk Report Class - Hitting time distribution of a batch of random walks
+# ----------------------------------------------------------------------------------
+class WalkReport:
+    def __init__(self, walkers, N, hitting, shortest):
+        self.walkers = walkers
+        self.N = N
+        self.hitting = hitting
+        self.shortest = shortest
+
+    def solved_fraction(self):
+        return float((self.hitting >= 0).mean()) if self.walkers > 0 else 0.0
+
+    # FUNCTION - Returns {percentile: steps} over the walkers that reached the goal
+    def percentiles(self, points=(10, 25, 50, 75, 90)):
+        solved = self.hitting[self.hitting >= 0]
+        if len(solved) == 0:
+            return {}
+        return {point: float(numpy.percentile(solved, point)) for point in points}
+
+    # FUNCTION - Returns (bin edges, counts) of the hitting times
+    def histogram(self, bins=10):
+        solved = self.hitting[self.hitting >= 0]
+        counts, edges = numpy.histogram(solved, bins=bins)
+        return edges.tolist(), counts.tolist()
+
+    def to_dict(self):
+        solved = self.hitting[self.hitting >= 0]
+        return {
+            "walkers": self.walkers,
+            "steps": self.N,
+            "solved_fraction": self.solved_fraction(),
+            "mean_hitting_time": float(solved.mean()) if len(solved) > 0 else None,
+            "percentiles": self.percentiles(),
+            "histogram": self.histogram(),
+            "shortest": self.shortest.depth if self.shortest is not None else None,
+        }
+
+
+# ----------------------------------------------------------------------------------
+# Search Result Class - Solution path and search effort
+# ----------------------------------------------------------------------------------
+SOLVED = "solved"
+UNSOLVED = "unsolved"
+UNSOLVABLE = "unsolvable"
+TIMEOUT = "timeout"
+OUT_OF_BUDGET = "budget"
+ADMISSIBLE = ("blocking", "pdb")
+# Most state keys IDAstar remembers per iteration
+IDA_TABLE = 1 << 20
+
+
+class SearchResult:
+    '''
+    The path found by a search and its stats. A solved result carries bound,
+    the factor by which its path is guaranteed to be at most the shortest
+    one (1.0 for the optimal modes), or None without a guarantee. A search
+    that ran out of its budget keeps status TIMEOUT or OUT_OF_BUDGET and the
+    path to the board it reached that looked closest to the goal.
+    '''
+    def __init__(self, path, stats, status=None, bound=None):
+        self.path = path
+        self.stats = stats
+        self.expanded = stats.expanded
+        self.depth = len(path) - 1 if len(path) > 0 else None
+        if status is None:
+            status = SOLVED if len(path) > 0 else UNSOLVABLE
+        self.status = status
+        self.bound = bound if status == SOLVED else None
+
+    def solved(self):
+        return self.status == SOLVED
+
+    # FUNCTION - Returns the (car, delta) moves taken along the path
+    def moves(self):
+        moves = []
+        for before, after in zip(self.path, self.path[1:]):
+            for car in before.table:
+                delta = car.offset(after.positions) - car.offset(before.positions)
+                if delta != 0:
+                    moves.append((car.name, delta))
+                    break
+        return moves
+
+    # FUNCTION - Returns the moves in the compact notation, e.g. "x+2 q-3"
+    def notation(self):
+        return format_moves(self.moves())
+
+
+# ----------------------------------------------------------------------------------
+# Search Budget Class - Time, node and memory limits of one search
+# ----------------------------------------------------------------------------------
+MEMORY_EVERY = 1024
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# FUNCTION - Returns the resident memory of this process in bytes
+def memory_usage():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * mmap.PAGESIZE
+    except OSError:
+        # Peak rather than current memory where /proc is missing
+        if resource is None:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class SearchBudget:
+    '''
+    Limits of one search: timeout seconds, nodes expansions and memory
+    megabytes of growth in resident memory, sampled every MEMORY_EVERY
+    expansions. A search calls spent() once per expansion; after it returns
+    True, status says which limit ran out.
+    '''
+    def __init__(self, timeout=None, nodes=None, memory=None):
+        self.deadline = None if timeout is None else time.perf_counter() + timeout
+        self.nodes = nodes
+        self.memory = None if memory is None else memory * 1024 * 1024
+        self.baseline = memory_usage() if memory is not None else 0
+        self.status = None
+
+    def spent(self, stats):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.status = TIMEOUT
+        elif self.nodes is not None and stats.expanded >= self.nodes:
+            self.status = OUT_OF_BUDGET
+        elif (self.memory is not None and stats.expanded % MEMORY_EVERY == 0
+              and memory_usage() - self.baseline > self.memory):
+            self.status = OUT_OF_BUDGET
+        return self.status is not None
+
+    # FUNCTION - Returns the result of a spent search: the path to the board
+    # among boards that estimate ranks closest to the goal (the first board
+    # without an estimate)
+    def partial(self, parents, boards, stats, estimate=None):
+        boards = list(boards)
+        if len(boards) == 0:
+            return SearchResult([], stats.finish(), self.status)
+        closest = min(boards, key=estimate) if estimate is not None else boards[0]
+        return SearchResult(trace_path(parents, closest), stats.finish(), self.status)
+
+
+# ----------------------------------------------------------------------------------
+# Search Stats Class - Counters and timings collected by every search mode
+# ----------------------------------------------------------------------------------
+SUCCESSORS = "successors"
+HEURISTIC = "heuristic"
+FRONTIER = "frontier"
+OTHER = "other"
+
+
+class SearchStats:
+    '''
+    Searches call lap(phase) at the end of each phase of an expansion, so the
+    time since the previous lap is charged to that phase and the phases add
+    up to the elapsed time. Peak memory is only traced when memory=True since
+    tracemalloc slows the search down several times. When sample is given it
+    is called with the stats every `every` expansions.
+    '''
+
+    def __init__(self, memory=False, sample=None, every=10000):
+        self.mode = None
+        self.memory = memory
+        self.sample = sample
+        self.every = every
+        self.generated = 0
+        self.expanded = 0
+        self.duplicates = 0
+        self.max_frontier = 0
+        self.times = dict.fromkeys((SUCCESSORS, HEURISTIC, FRONTIER, OTHER), 0.0)
+        self.elapsed = 0.0
+        self.peak_memory = None
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.tracing = False
+
+    # FUNCTION - Returns stats (a new one when None) reset for a search run
+    @staticmethod
+    def begin(stats, mode):
+        if stats is None:
+            stats = SearchStats()
+        stats.mode = mode
+        if stats.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            stats.tracing = True
+        if stats.memory:
+            tracemalloc.reset_peak()
+        stats.started = time.perf_counter()
+        stats.last = stats.started
+        return stats
+
+    # FUNCTION - Charges the time since the last lap to phase
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.times[phase] += now - self.last
+        self.last = now
+
+    # FUNCTION - Counts one expansion with the current frontier size
+    def expand(self, frontier):
+        self.expanded += 1
+        if frontier > self.max_frontier:
+            self.max_frontier = frontier
+        if self.sample is not None and self.expanded % self.every == 0:
+            self.sample(self)
+
+    # FUNCTION - Stops the clock and memory tracing, returns the stats
+    def finish(self):
+        self.lap(OTHER)
+        self.elapsed = self.last - self.started
+        if self.memory:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+        return self
+
+    def nodes_per_second(self):
+        elapsed = self.elapsed or (time.perf_counter() - self.started)
+        return self.expanded / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "mode": self.mode,
+            "generated": self.generated,
+            "expanded": self.expanded,
+            "duplicates": self.duplicates,
+            "max_frontier": self.max_frontier,
+            "nodes_per_second": round(self.nodes_per_second(), 1),
+            "elapsed": round(self.elapsed, 6),
+            "times": {phase: round(spent, 6) for phase, spent in self.times.items()},
+            "peak_memory": self.peak_memory,
+        }
+
+    # FUNCTION - Writes the stats as JSON to a filename or open stream
+    def dump(self, target):
+        if isinstance(target, str):
+            with open(target, "w") as stream:
+                json.dump(self.to_dict(), stream, indent=2)
+        else:
+            json.dump(self.to_dict(), target, indent=2)
+            target.write("\n")
+
+
+# FUNCTION - Rebuilds the path to node from parent links keyed by state key
+def trace_path(parents, node):
+    path = []
+    while node is not None:
+        path.append(node)
+        node = parents[node.key()]
+    path.reverse()
+    return path
+
 
 # ----------------------------------------------------------------------------------
 # Path Class - Handles Creating Path
@@ -369,67 +1397,1282 @@ class Path:
         if (len(self.path) > 0):
             self.print(self.path[-1])
 
+    # FUNCTION - Returns the path drawn six boards per row
+    def render(self, path):
+        rows = [render_row(path[i:i + PATH_ROW]) for i in range(0, len(path), PATH_ROW)]
+        return "".join(rows) + "\n"
+
     def print(self, path=None):
-        # Process path to print
-        while(len(path) > 0):
-            boards = []
-            for _ in range(6):
-                if (len(path) == 0):
-                    break
-                boards.append(path.pop(0))
-            self.print_row(boards)
-        print()
+        sys.stdout.write(self.render(path))
 
     def print_row(self, boards):
-        width = len(boards)
-        height = 6
-        # PRINT
-        print(" ------ " * width)
-        for i in range(height):
-            for board in boards:
-                bar = " " if (i == 2) else "|"
-                print("|"+"".join(board.board_state[i]), end=bar)
-            print("")
-        print(" ------ " * width)
+        sys.stdout.write(render_row(boards))
+
+
+# FUNCTION - Returns the boards drawn side by side as one string
+def render_row(boards):
+    grids = [board.board_state for board in boards]
+    border = " ------ " * len(boards)
+    lines = [border]
+    for i in range(SIZE):
+        bar = " " if (i == EXIT_ROW) else "|"
+        lines.append("".join(["|" + "".join(grid[i]) + bar for grid in grids]))
+    lines.append(border)
+    return "\n".join(lines) + "\n"
 
 
 # ----------------------------------------------------------------------------------
-# Main Function
+# Output Levels - How much of a search result the command line writes
 # ----------------------------------------------------------------------------------
-if __name__ == "__main__":
+QUIET = "none"
+SUMMARY = "summary"
+SOLUTION = "solution"
+TRACE = "trace"
+OUTPUT_LEVELS = (QUIET, SUMMARY, SOLUTION, TRACE)
+PATH_ROW = 6
+
+
+# FUNCTION - Returns moves in the compact notation, e.g. "x+2 q-3"
+def format_moves(moves):
+    return " ".join(["%s%+d" % (name, delta) for name, delta in moves])
+
+
+# FUNCTION - Returns a search result as text for the output level: nothing,
+# a one line summary, or the solution (grids or compact moves) followed by the
+# footer, which defaults to the expanded node count
+def render_result(result, level, compact=False, footer=None):
+    if level == QUIET:
+        return ""
+    if level == SUMMARY:
+        summary = "%s %s moves %d expanded %.3fs" % (
+            result.status, result.depth, result.expanded, result.stats.elapsed)
+        if result.bound is not None:
+            summary += " bound %.3g" % result.bound
+        return summary + "\n"
+
+    footer = result.expanded if footer is None else footer
+    if compact:
+        return "%s\n%s\n" % (format_moves(result.moves()), footer)
+    return "%s%s\n" % (Path().render(result.path), footer)
+
+
+# FUNCTION - Removes the --level, --compact, --cache and budget options from
+# the command line arguments, returning the remaining arguments and the options
+def output_options(arguments):
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--level", choices=OUTPUT_LEVELS, default=None)
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--cache", nargs="?", const="", default=None)
+    parser.add_argument("--timeout", type=float, default=None)
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--memory", type=float, default=None)
+    options, rest = parser.parse_known_args(arguments)
+    return rest, options
 
-    arguments_length = len(sys.argv)
+
+# ----------------------------------------------------------------------------------
+# Distance Database - Exact distance to goal for a whole reachable state space
+# ----------------------------------------------------------------------------------
+UNREACHABLE = 255
+DB_MAGIC = b"RHD2"
+# magic, state count, start board string
+DB_HEADER = struct.Struct("<4s4xQ48s")
+DB_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+# FUNCTION - Returns the bucket of a state key in a table of count buckets
+# The key is scrambled by a 64 bit multiply and scaled to range(count)
+def db_bucket(key, count):
+    return ((key * DB_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) * count >> 64
+
+
+# FUNCTION - Returns {key: successor keys} for every state reachable from
+# board, or None when there are more than limit of them
+def reachable_states(board, limit=None):
+    states = {}
+    queue = collections.deque([board.key()])
+    seen = {board.key()}
+
+    while(len(queue) > 0):
+        key = queue.popleft()
+        children = board.from_key(key).next_keys()
+        states[key] = children
+        for child in children:
+            if child not in seen:
+                seen.add(child)
+                queue.append(child)
+        if limit is not None and len(seen) > limit:
+            return None
+
+    return states
+
+
+# FUNCTION - Returns {key: moves to goal} for every state reachable from board
+# Slides are reversible, so a BFS outward from every solved state over the
+# reachable graph gives each state its exact distance to the nearest goal.
+# The successors found while enumerating the states are reused, so moves are
+# only generated once per state
+def goal_distances(board, limit=None):
+    states = reachable_states(board, limit)
+    if states is None:
+        return None
+    x = board.by_name.get("x")
+    if x is None:
+        frontier = []
+    else:
+        # Board.done() on the key alone
+        frontier = [key for key in states if x.masks[x.offset(key)] & GOAL_MASK == GOAL_MASK]
+    distances = dict.fromkeys(frontier, 0)
+    depth = 0
+
+    while(len(frontier) > 0):
+        depth += 1
+        next_frontier = []
+        for key in frontier:
+            for child in states[key]:
+                if child not in distances:
+                    distances[child] = min(depth, UNREACHABLE - 1)
+                    next_frontier.append(child)
+        frontier = next_frontier
+
+    for key in states:
+        distances.setdefault(key, UNREACHABLE)
+    return distances
+
+
+# FUNCTION - Writes the distance table of board's state space to filename
+# Layout: header, state keys grouped by db_bucket() (native uint64), the
+# first index of every bucket plus the end (native uint32), one distance
+# byte per key
+def write_distance_table(board, filename):
+    distances = goal_distances(board)
+    count = len(distances)
+    keys = array.array("Q", sorted(distances, key=lambda key: (db_bucket(key, count), key)))
+    starts = array.array("I", [0]) * (count + 1)
+    for key in keys:
+        starts[db_bucket(key, count) + 1] += 1
+    for bucket in range(count):
+        starts[bucket + 1] += starts[bucket]
+    values = array.array("B", [distances[key] for key in keys])
+
+    with open(filename, "wb") as db:
+        db.write(DB_HEADER.pack(DB_MAGIC, len(keys), str(board).encode()))
+        keys.tofile(db)
+        starts.tofile(db)
+        values.tofile(db)
+
+    return len(keys)
+
+
+# ----------------------------------------------------------------------------------
+# Distance Table Class - Memory mapped lookups into a distance database
+# ----------------------------------------------------------------------------------
+class DistanceTable:
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, board_state = DB_HEADER.unpack_from(self.map)
+        if magic != DB_MAGIC:
+            self.close()
+            raise ValueError(filename + " is not a distance database")
+
+        self.board = Board(board_state.rstrip(b"\0").decode())
+        view = memoryview(self.map)
+        start = DB_HEADER.size
+        self.keys = view[start:start + 8 * count].cast("Q")
+        start += 8 * count
+        self.starts = view[start:start + 4 * (count + 1)].cast("I")
+        start += 4 * (count + 1)
+        self.distances = view[start:start + count]
+        view.release()
+
+    # FUNCTION - Returns the rank of board's state in the table
+    # There are as many buckets as states, so a lookup scans about one key
+    def rank(self, board):
+        if board.table != self.board.table:
+            raise ValueError("board does not belong to this database")
+        key = board.key()
+        bucket = db_bucket(key, len(self.keys))
+        for index in range(self.starts[bucket], self.starts[bucket + 1]):
+            if self.keys[index] == key:
+                return index
+        raise ValueError("board is not reachable from " + str(self.board))
+
+    # FUNCTION - Returns the optimal number of moves left, None if unsolvable
+    def distance(self, board):
+        distance = self.distances[self.rank(board)]
+        return None if distance == UNREACHABLE else distance
+
+    # FUNCTION - Returns an optimal (car, delta) move, None if solved or stuck
+    def best_move(self, board):
+        distance = self.distance(board)
+        if distance is None or distance == 0:
+            return None
+        for move in board.moves():
+            board.apply(move)
+            closer = self.distance(board) == distance - 1
+            board.undo(move)
+            if closer:
+                return move
+        return None
+
+    # FUNCTION - Follows best moves from board to the goal
+    def solve(self, board):
+        stats = SearchStats.begin(None, "optimal")
+        current = board.clone()
+        path = [current.clone()]
+        if self.distance(current) is None:
+            return SearchResult([], stats.finish())
+        while not current.done():
+            current.apply(self.best_move(current))
+            path.append(current.clone())
+            stats.expand(1)
+        return SearchResult(path, stats.finish())
+
+    def close(self):
+        for view in ("keys", "starts", "distances"):
+            if hasattr(self, view):
+                getattr(self, view).release()
+        self.map.close()
+        self.file.close()
+
+
+# ----------------------------------------------------------------------------------
+# Pattern Database Class - Exact costs of an abstracted subproblem
+# ----------------------------------------------------------------------------------
+PDB_LIMIT = 1 << 18
+PDB_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "rushhour")
+
+
+class PatternDatabase:
+    '''
+    The pattern keeps x, every car covering the exit row and, while the table
+    stays under PDB_LIMIT entries, the cars sharing a column with those
+    blockers. All other cars are removed, so the exact distance to the goal
+    in that relaxed puzzle never overestimates the real one. Distances are
+    stored in one byte per pattern placement, indexed by the mixed radix rank
+    of the pattern cars' offsets.
+
+    The gain over the blocking heuristic is small. On 26-51 move puzzles it
+    expands 0-22% fewer nodes in about the same time once the table is
+    cached; building a table takes seconds. Removing cars relaxes Rush Hour
+    too much: the pattern estimate at the start is 5-8 moves. Larger tables
+    (2^21) or several patterns combined with max did not do better.
+    '''
+    tables = {}
+
+    def __init__(self, cars, distances):
+        self.cars = cars
+        self.strides = []
+        stride = 1
+        for car in cars:
+            self.strides.append(stride)
+            stride *= SIZE - car.length + 1
+        self.distances = distances
+
+    # FUNCTION - Returns the pattern cars of board, in board.table order
+    @staticmethod
+    def pattern(board):
+        x = board.by_name.get("x")
+        if x is None or not x.horizontal:
+            return []
+        row = 0
+        for col in range(SIZE):
+            row |= cell_bit(x.lane, col)
+
+        pattern = {x.name}
+        columns = set()
+        for car in board.table:
+            if car.masks[car.offset(board.positions)] & row:
+                pattern.add(car.name)
+                if not car.horizontal:
+                    columns.add(car.lane)
+
+        size = 1
+        for name in pattern:
+            size *= SIZE - board.by_name[name].length + 1
+        for car in board.table:
+            if car.name in pattern:
+                continue
+            cells = car.position(car.offset(board.positions))
+            if any(col in columns for _, col in cells):
+                if size * (SIZE - car.length + 1) <= PDB_LIMIT:
+                    pattern.add(car.name)
+                    size *= SIZE - car.length + 1
+
+        return [car for car in board.table if car.name in pattern]
+
+    # FUNCTION - Returns the pattern database for board, built at most once
+    @classmethod
+    def load(cls, board, directory=PDB_DIRECTORY):
+        cars = cls.pattern(board)
+        if len(cars) == 0:
+            return cls([], array.array("B", [0]))
+
+        # The relaxed puzzle: only the pattern cars, at their current offsets
+        grid = [[EMPTY] * SIZE for _ in range(SIZE)]
+        for car in cars:
+            for i, j in car.position(car.offset(board.positions)):
+                grid[i][j] = car.name
+        abstract = Board(grid)
+
+        signature = "".join(["%s%s%d%d" % ("x" if car.name == "x" else ".",
+                                           "h" if car.horizontal else "v",
+                                           car.length, car.lane)
+                             for car in abstract.table])
+        distances = cls.tables.get(signature)
+
+        if distances is None:
+            digest = hashlib.sha1(signature.encode()).hexdigest()[:16]
+            filename = os.path.join(directory, "pdb-" + digest + ".bin")
+            size = 1
+            for car in abstract.table:
+                size *= SIZE - car.length + 1
+            if os.path.exists(filename) and os.path.getsize(filename) == size:
+                distances = array.array("B")
+                with open(filename, "rb") as table:
+                    distances.fromfile(table, size)
+            else:
+                distances = cls.build(abstract)
+                os.makedirs(directory, exist_ok=True)
+                with open(filename + ".tmp", "wb") as table:
+                    distances.tofile(table)
+                os.replace(filename + ".tmp", filename)
+            cls.tables[signature] = distances
+
+        return cls([board.by_name[car.name] for car in abstract.table], distances)
+
+    # FUNCTION - Returns the distance table over every placement of the pattern
+    @classmethod
+    def build(cls, abstract):
+        pdb = cls(abstract.table, None)
+        size = 1
+        for car in abstract.table:
+            size *= SIZE - car.length + 1
+        distances = array.array("B", [UNREACHABLE]) * size
+
+        # Every legal placement with x on the goal is a source
+        frontier = []
+        x = abstract.by_name["x"]
+        for rank in range(size):
+            key = 0
+            occupied = 0
+            legal = True
+            for car, stride in zip(abstract.table, pdb.strides):
+                mask = car.masks[(rank // stride) % (SIZE - car.length + 1)]
+                if occupied & mask:
+                    legal = False
+                    break
+                occupied |= mask
+                key |= ((rank // stride) % (SIZE - car.length + 1)) << car.shift
+            if legal and x.masks[x.offset(key)] & GOAL_MASK == GOAL_MASK:
+                distances[rank] = 0
+                frontier.append(key)
+
+        depth = 0
+        while(len(frontier) > 0):
+            depth += 1
+            next_frontier = []
+            for key in frontier:
+                for child in abstract.from_key(key).next_keys():
+                    rank = pdb.rank(child)
+                    if distances[rank] == UNREACHABLE:
+                        distances[rank] = min(depth, UNREACHABLE - 1)
+                        next_frontier.append(child)
+            frontier = next_frontier
+
+        return distances
+
+    # FUNCTION - Returns the rank of the pattern placement in positions
+    def rank(self, positions):
+        rank = 0
+        for car, stride in zip(self.cars, self.strides):
+            rank += car.offset(positions) * stride
+        return rank
+
+    # FUNCTION - Returns the admissible pattern cost of board
+    def lookup(self, board):
+        distance = self.distances[self.rank(board.positions)]
+        return 0 if distance == UNREACHABLE else distance
+
+
+# ----------------------------------------------------------------------------------
+# Puzzle Generator - Hardest state of random layouts, over a process pool
+# ----------------------------------------------------------------------------------
+
+# FUNCTION - Adds up to cars random cars to the empty cells of a board
+# string, never horizontally in the exit row
+def add_cars(rng, layout, cars, tries=20):
+    grid = [list(row) for row in layout.split("|")]
+    names = iter([c for c in CAR_NAMES if c != "x" and c not in layout])
+    name = next(names)
+    placed = 0
+    for _ in range(cars * tries):
+        if placed == cars:
+            break
+        length = 3 if rng.random() < 0.25 else 2
+        if rng.random() < 0.5:
+            # Horizontal cars in the exit row could never let x out
+            row = rng.choice([i for i in range(SIZE) if i != EXIT_ROW])
+            col = rng.randint(0, SIZE - length)
+            cells = [(row, col + k) for k in range(length)]
+        else:
+            row = rng.randint(0, SIZE - length)
+            col = rng.randint(0, SIZE - 1)
+            cells = [(row + k, col) for k in range(length)]
+        if all([grid[i][j] == EMPTY for i, j in cells]):
+            for i, j in cells:
+                grid[i][j] = name
+            name = next(names)
+            placed += 1
+
+    return "|".join(["".join(row) for row in grid])
+
+
+# FUNCTION - Returns a random legal layout in the parse_state string format
+def random_layout(rng, cars):
+    grid = [EMPTY * SIZE] * SIZE
+    x = rng.randint(0, SIZE - 2)
+    grid[EXIT_ROW] = EMPTY * x + "xx" + EMPTY * (SIZE - x - 2)
+    return add_cars(rng, "|".join(grid), cars)
+
+
+# FUNCTION - Returns (moves, canonical board) of the hardest solvable state
+# reachable from layout, or None
+def hardest_state(layout, limit):
+    board = Board(layout)
+    distances = goal_distances(board, limit)
+    if distances is None:
+        return None
+    solvable = [d for d in distances.values() if d != UNREACHABLE]
+    if len(solvable) == 0:
+        return None
+
+    farthest = max(solvable)
+    # Several states can tie for farthest; keep the same one on every run
+    hardest = min([key for key, d in distances.items() if d == farthest])
+    return farthest, board.from_key(hardest).canonical()
+
+
+# FUNCTION - Returns (moves, canonical board) of the hardest state found from
+# a random layout, or None if it needs fewer than min_moves. The layout is
+# improved greedily: a car is added to the current hardest state and kept if
+# the new hardest state is farther from the goal
+def generate_task(task):
+    seed, min_moves, min_cars, max_cars, limit, rounds = task
+    rng = random.Random(seed)
+    best = hardest_state(random_layout(rng, min_cars), limit)
+
+    for _ in range(rounds):
+        if best is None or best[1].count(EMPTY) < 4:
+            break
+        if len(set(best[1]) - {EMPTY, "|"}) > max_cars:
+            break
+        found = hardest_state(add_cars(rng, best[1], 1), limit)
+        if found is not None and found[0] >= best[0]:
+            best = found
+
+    if best is None or best[0] < min_moves:
+        return None
+    return best
+
+
+def generate(arguments):
+    parser = argparse.ArgumentParser(
+        prog="rushhour.py generate",
+        description="Write hard puzzles found by reverse search from random layouts.")
+    parser.add_argument("-n", "--count", type=int, default=100,
+                        help="number of distinct puzzles to write")
+    parser.add_argument("-m", "--min-moves", type=int, default=20)
+    parser.add_argument("--min-cars", type=int, default=6,
+                        help="cars in the starting random layout")
+    parser.add_argument("--max-cars", type=int, default=14)
+    parser.add_argument("-r", "--rounds", type=int, default=12,
+                        help="cars tried when improving each layout")
+    parser.add_argument("--max-states", type=int, default=25000,
+                        help="skip layouts with larger state spaces")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-c", "--chunksize", type=int, default=4)
+    parser.add_argument("-o", "--output", default="-")
+    options = parser.parse_args(arguments)
+
+    target = sys.stdout if options.output == "-" else open(options.output, "w")
+    tasks = ((seed, options.min_moves, options.min_cars, options.max_cars,
+              options.max_states, options.rounds)
+             for seed in itertools.count(options.seed))
+    seen = set()
+
+    with multiprocessing.Pool(options.workers) as pool:
+        for found in pool.imap_unordered(generate_task, tasks, options.chunksize):
+            if found is None or found[1] in seen:
+                continue
+            seen.add(found[1])
+            target.write("# %d moves\n%s\n" % found)
+            target.flush()
+            if len(seen) == options.count:
+                pool.terminate()
+                break
+
+    if target is not sys.stdout:
+        target.close()
+
+
+# ----------------------------------------------------------------------------------
+# Solution Cache - Solved boards on disk behind an in-memory LRU
+# ----------------------------------------------------------------------------------
+CACHE_FILE = os.path.join(PDB_DIRECTORY, "solutions.sqlite")
+DEFAULT_HEURISTICS = {"astar": "default", "idastar": "blocking", "wastar": "blocking",
+                      "beam": "blocking"}
+CACHE_COUNTERS = ("hits", "memory_hits", "misses", "stores", "evictions")
+RECOUNT_EVERY = 1000
+
+
+# FUNCTION - True if mode with heuristic always returns a shortest path
+def optimal_solver(mode, heuristic=None):
+    if mode in ("bfs", "bibfs", "parallel"):
+        return True
+    return mode in ("astar", "idastar") and heuristic in ADMISSIBLE
+
+
+class SolutionCache:
+    """Solved boards keyed by their canonical string (see Board.canonical).
+
+    Entries live in a sqlite table of at most capacity rows, fronted by an LRU
+    dict of at most memory entries. Each entry records the solver and
+    heuristic that produced it and whether that solver is optimal: an optimal
+    entry is only ever replaced by nothing, and a suboptimal one only by an
+    optimal or shorter solution. Searches that must be optimal only accept
+    optimal entries. When the table is full the least recently used rows are
+    evicted. Hit, miss, store and eviction counters are kept in the same file,
+    so they add up over every process and run that used it. The row count is
+    tracked as rows are added and only recounted every RECOUNT_EVERY stores or
+    when it passes capacity, since other processes may write to the file.
+    """
+
+    def __init__(self, filename=CACHE_FILE, memory=1024, capacity=100000):
+        directory = os.path.dirname(filename)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        self.filename = filename
+        self.memory = memory
+        self.capacity = capacity
+        self.lru = collections.OrderedDict()
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.clock = 0
+        self.db = sqlite3.connect(filename, timeout=30)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            "board TEXT PRIMARY KEY, status TEXT, moves TEXT, depth INTEGER, "
+            "solver TEXT, heuristic TEXT, optimal INTEGER, used INTEGER)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+        self.db.executemany("INSERT OR IGNORE INTO counters VALUES (?, 0)",
+                            [(name,) for name in CACHE_COUNTERS])
+        self.db.commit()
+        row = self.db.execute("SELECT MAX(used) FROM solutions").fetchone()
+        self.clock = row[0] or 0
+        self.rows = len(self)
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    # FUNCTION - Adds n to a counter in memory and, uncommitted, in the file
+    def count(self, name, n=1):
+        setattr(self, name, getattr(self, name) + n)
+        self.db.execute("UPDATE counters SET value = value + ? WHERE name = ?", (n, name))
+
+    # FUNCTION - Returns the counters summed over every user of the file
+    def totals(self):
+        return dict(self.db.execute("SELECT name, value FROM counters").fetchall())
+
+    # FUNCTION - Returns the entry for a canonical board string, or None
+    def entry(self, key):
+        entry = self.lru.get(key)
+        if entry is not None:
+            self.lru.move_to_end(key)
+            return entry
+
+        row = self.db.execute(
+            "SELECT status, moves, depth, solver, heuristic, optimal "
+            "FROM solutions WHERE board = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        status, moves, depth, solver, heuristic, optimal = row
+        entry = {"status": status, "moves": json.loads(moves), "depth": depth,
+                 "solver": solver, "heuristic": heuristic, "optimal": bool(optimal)}
+        self.clock += 1
+        self.db.execute("UPDATE solutions SET used = ? WHERE board = ?", (self.clock, key))
+        self.db.commit()
+        self.remember(key, entry)
+        return entry
+
+    def remember(self, key, entry):
+        self.lru[key] = entry
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.memory:
+            self.lru.popitem(last=False)
+
+    # FUNCTION - Returns a SearchResult replaying the cached moves on board,
+    # or None on a miss or when only an optimal entry would do
+    def get(self, board, optimal=False):
+        key = board.canonical()
+        in_memory = key in self.lru
+        entry = self.entry(key)
+        if entry is None or (optimal and not entry["optimal"]):
+            self.count("misses")
+            self.db.commit()
+            return None
+        self.count("hits")
+        if in_memory:
+            self.count("memory_hits")
+        self.db.commit()
+
+        stats = SearchStats.begin(None, "cache")
+        if entry["status"] != SOLVED:
+            return SearchResult([], stats.finish(), entry["status"])
+        names = {name: car for car, name in board.canonical_names().items()}
+        current = board.clone()
+        path = [current.clone()]
+        for name, delta in entry["moves"]:
+            current.apply((current.by_name[names[name]], delta))
+            path.append(current.clone())
+        return SearchResult(path, stats.finish(), bound=1.0 if entry["optimal"] else None)
+
+    # FUNCTION - Stores a result unless the cached entry is at least as good,
+    # returns True if it was stored
+    def put(self, board, result, solver, heuristic=None):
+        if result.status not in (SOLVED, UNSOLVABLE):
+            return False
+        optimal = optimal_solver(solver, heuristic)
+        if result.status == UNSOLVABLE and not optimal:
+            return False
+
+        key = board.canonical()
+        old = self.entry(key)
+        if old is not None:
+            if old["optimal"] or (not optimal and (old["depth"] or 0) <= (result.depth or 0)):
+                return False
+
+        names = board.canonical_names()
+        moves = [(names[name], delta) for name, delta in result.moves()]
+        entry = {"status": result.status, "moves": moves, "depth": result.depth,
+                 "solver": solver, "heuristic": heuristic, "optimal": optimal}
+        self.clock += 1
+        self.db.execute(
+            "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, result.status, json.dumps(moves), result.depth, solver, heuristic,
+             int(optimal), self.clock))
+        if old is None:
+            self.rows += 1
+        self.count("stores")
+        if self.rows > self.capacity or self.stores % RECOUNT_EVERY == 0:
+            self.rows = len(self)
+        self.evict()
+        self.db.commit()
+        self.remember(key, entry)
+        return True
+
+    # FUNCTION - Drops the least recently used rows beyond capacity
+    def evict(self):
+        excess = self.rows - self.capacity
+        if excess <= 0:
+            return
+        rows = self.db.execute(
+            "SELECT board FROM solutions ORDER BY used LIMIT ?", (excess,)).fetchall()
+        self.db.executemany("DELETE FROM solutions WHERE board = ?", rows)
+        for (key,) in rows:
+            self.lru.pop(key, None)
+        self.rows -= len(rows)
+        self.count("evictions", len(rows))
+
+    # FUNCTION - Returns a cached result for board, or searches and caches it
+    def solve(self, board, mode, heuristic=None, solver=None, **options):
+        if mode in DEFAULT_HEURISTICS:
+            heuristic = heuristic or DEFAULT_HEURISTICS[mode]
+            options["heuristic"] = heuristic
+        result = self.get(board, optimal_solver(mode, heuristic))
+        if result is not None:
+            return result
+        result = (solver or SOLVERS[mode])(board, **options)
+        self.put(board, result, mode, heuristic)
+        return result
+
+    # FUNCTION - Returns the counters of every run that used the file
+    def to_dict(self):
+        totals = self.totals()
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            "hits": totals["hits"],
+            "memory_hits": totals["memory_hits"],
+            "misses": totals["misses"],
+            "hit_rate": round(totals["hits"] / lookups, 4) if lookups > 0 else None,
+            "stores": totals["stores"],
+            "evictions": totals["evictions"],
+            "entries": len(self),
+        }
+
+
+# Caches opened by this process, one per filename, so pool workers reuse them
+open_caches = {}
+
+
+def solution_cache(filename=CACHE_FILE):
+    if filename not in open_caches:
+        open_caches[filename] = SolutionCache(filename)
+    return open_caches[filename]
+
+
+# ----------------------------------------------------------------------------------
+# Batch Solver - Solves a stream of boards over a process pool
+# ----------------------------------------------------------------------------------
+SOLVERS = {
+    "bfs": Board.bfs,
+    "astar": Board.Astar,
+    "idastar": Board.IDAstar,
+    "bibfs": Board.bidirectional_bfs,
+    "wastar": Board.weighted_Astar,
+    "beam": Board.beam,
+}
+
+
+# FUNCTION - Yields (index, board string) for every board line in a stream
+def read_boards(stream):
+    index = 0
+    for line in stream:
+        line = line.rstrip("\r\n")
+        if line.strip() == "" or line.startswith("#"):
+            continue
+        yield index, line
+        index += 1
+
+
+# FUNCTION - Solves one (index, board string, mode, search options, cache file
+# or None) task
+def solve_task(task):
+    index, board_state, mode, options, cache = task
+    record = {"index": index, "board": board_state, "mode": mode}
+    options = dict(options)
+    heuristic = options.pop("heuristic", None)
+    if heuristic is not None:
+        record["heuristic"] = heuristic
+    start = time.perf_counter()
+    try:
+        if cache is not None:
+            result = solution_cache(cache).solve(Board(board_state), mode, heuristic, **options)
+            record["cached"] = result.stats.mode == "cache"
+        else:
+            if heuristic is not None:
+                options["heuristic"] = heuristic
+            result = SOLVERS[mode](Board(board_state), **options)
+    except (IndexError, ValueError) as error:
+        record.update(status="invalid", error=str(error))
+        return record
+    record.update(
+        status=result.status,
+        moves=result.moves(),
+        depth=result.depth,
+        bound=result.bound,
+        expanded=result.expanded,
+        time=round(time.perf_counter() - start, 6),
+        stats=result.stats.to_dict())
+    return record
+
+
+def batch(arguments):
+    parser = argparse.ArgumentParser(
+        prog="rushhour.py batch",
+        description="Solve one board per line and write one JSON record per board.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="file with one board per line, - for stdin")
+    parser.add_argument("-o", "--output", default="-",
+                        help="JSONL output file, - for stdout")
+    parser.add_argument("-m", "--mode", default="bfs", choices=sorted(SOLVERS))
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-c", "--chunksize", type=int, default=16)
+    parser.add_argument("-t", "--timeout", type=float, default=None,
+                        help="seconds allowed per board")
+    parser.add_argument("-n", "--nodes", type=int, default=None,
+                        help="expansions allowed per board")
+    parser.add_argument("--memory", type=float, default=None,
+                        help="megabytes of memory growth allowed per board")
+    parser.add_argument("-H", "--heuristic", default=None,
+                        choices=["default", "blocking", "pdb"],
+                        help="heuristic for astar, idastar, wastar and beam")
+    parser.add_argument("--weight", type=float, default=2.0, help="wastar weight")
+    parser.add_argument("--width", type=int, default=100, help="beam width")
+    parser.add_argument("-u", "--unordered", action="store_true",
+                        help="write records in completion order")
+    parser.add_argument("--cache", nargs="?", const=CACHE_FILE, default=None,
+                        help="reuse and store solutions in a sqlite cache file")
+    options = parser.parse_args(arguments)
+
+    source = sys.stdin if options.input == "-" else open(options.input)
+    target = sys.stdout if options.output == "-" else open(options.output, "w")
+    search = {"timeout": options.timeout, "nodes": options.nodes,
+              "memory": options.memory, "heuristic": options.heuristic}
+    if options.mode == "wastar":
+        search["weight"] = options.weight
+    if options.mode == "beam":
+        search["width"] = options.width
+    search = {name: value for name, value in search.items() if value is not None}
+    tasks = ((index, board_state, options.mode, search, options.cache)
+             for index, board_state in read_boards(source))
+
+    with multiprocessing.Pool(options.workers) as pool:
+        if options.unordered:
+            records = pool.imap_unordered(solve_task, tasks, options.chunksize)
+        else:
+            records = pool.imap(solve_task, tasks, options.chunksize)
+        cached = 0
+        for record in records:
+            cached += record.get("cached", False)
+            target.write(json.dumps(record) + "\n")
+
+    if options.cache is not None:
+        sys.stderr.write("%d boards answered from %s\n" % (cached, options.cache))
+
+    if source is not sys.stdin:
+        source.close()
+    if target is not sys.stdout:
+        target.close()
+
+
+# ----------------------------------------------------------------------------------
+# Command Line - Runs one command and returns everything it writes
+# ----------------------------------------------------------------------------------
+USAGE = """
+Invalid command.
+Valid commands: print | done | next | random | walks | bfs | bibfs | astar | idastar
+                wastar | beam | parallel | pdb | stats | database | optimal | batch
+                generate | cache | serve
+Options: --level none|summary|solution|trace  --compact  --cache [FILE]
+Budgets: --timeout SECONDS  --nodes EXPANSIONS  --memory MEGABYTES
+
+"""
+
+# Every search mode the stats command can run, by name
+STATS_SOLVERS = dict(SOLVERS, random=Board.random, walks=Board.random_walks,
+                     parallel=Board.parallel_bfs)
+
+
+def command_line(arguments):
+    arguments, options = output_options(arguments)
+    arguments_length = len(arguments) + 1
+    level, compact = options.level, options.compact
 
     if(arguments_length < 2):
-        print("\nInvalid Command.\nPlease enter atleast 1 argument.\n")
-        sys.exit()
+        return "\nInvalid Command.\nPlease enter atleast 1 argument.\n\n"
 
     if(arguments_length > 2):
-        board_state = sys.argv[2]
+        board_state = arguments[1]
     else:
         board_state = "  o aa|  o   |xxo   |ppp  q|     q|     q"
 
-    command = sys.argv[1]
+    command = arguments[0]
     board = Board(board_state)
+    # Everything is rendered into one buffer and written once at the end
+    out = io.StringIO()
+
+    # FUNCTION - Runs a search through the solution cache when --cache is given
+    def search(mode, heuristic=None, solver=None, **search_options):
+        for budget in ("timeout", "nodes", "memory"):
+            if getattr(options, budget) is not None:
+                search_options[budget] = getattr(options, budget)
+        if options.cache is None:
+            if heuristic is not None:
+                search_options["heuristic"] = heuristic
+            return (solver or SOLVERS[mode])(board, **search_options)
+        cache = solution_cache(options.cache or CACHE_FILE)
+        return cache.solve(board, mode, heuristic, solver, **search_options)
+
+    if level is None:
+        level = TRACE if command == "astar" else SOLUTION
 
     if (command == "print"):
-        board.print()
+        out.write(board.render())
 
     elif (command == "done"):
-        print(board.done())
+        out.write("%s\n" % board.done())
 
     elif (command == "next"):
-        board.print(board.next())
+        out.write(board.render(board.next()))
 
     elif (command == "random"):
-        board.random()
+        result = board.random()
+        out.write(render_result(result, level, compact))
+
+    elif (command == "walks"):
+        walkers = int(arguments[2]) if arguments_length > 3 else 1000
+        report = board.random_walks(walkers)
+        if level != QUIET:
+            out.write(json.dumps(report.to_dict(), indent=2) + "\n")
+        if report.shortest is not None and level in (SOLUTION, TRACE):
+            out.write(render_result(report.shortest, level, compact))
 
     elif (command == "bfs"):
-        board.bfs()
+        result = search("bfs")
+        out.write(render_result(result, level, compact))
+
+    elif (command == "bibfs"):
+        result = search("bibfs")
+        out.write(render_result(result, level, compact))
+
+    elif (command == "parallel"):
+        workers = int(arguments[2]) if arguments_length > 3 else None
+        result = search("parallel", solver=Board.parallel_bfs, workers=workers)
+        out.write(render_result(result, level, compact))
 
     elif (command == "astar"):
-        board.Astar()
+        # The full trace already ends with the solution path, unless cached;
+        # --compact replaces the trace with the compact moves
+        traced = level == TRACE and not compact
+        result = search("astar", trace=out if traced else None)
+        if traced and result.stats.mode != "cache":
+            out.write("%d\n" % result.expanded)
+        else:
+            out.write(render_result(result, level, compact))
+
+    elif (command == "idastar"):
+        result = search("idastar")
+        out.write(render_result(result, level, compact))
+
+    elif (command == "pdb"):
+        result = search("astar", "pdb")
+        out.write(render_result(result, level, compact))
+
+    elif (command == "wastar"):
+        weight = float(arguments[2]) if arguments_length > 3 else 2.0
+        result = search("wastar", weight=weight)
+        out.write(render_result(result, level, compact))
+
+    elif (command == "beam"):
+        width = int(arguments[2]) if arguments_length > 3 else 100
+        result = search("beam", width=width)
+        out.write(render_result(result, level, compact))
+
+    elif (command == "stats"):
+        mode = arguments[2] if arguments_length > 3 else "bfs"
+        if mode in STATS_SOLVERS:
+            stats = SearchStats(memory=True)
+            STATS_SOLVERS[mode](board, stats=stats)
+            stats.dump(out)
+        else:
+            out.write(USAGE)
+
+    elif (command == "database"):
+        filename = arguments[2] if arguments_length > 3 else "rushhour.db"
+        count = write_distance_table(board, filename)
+        out.write("%d states written to %s\n" % (count, filename))
+
+    elif (command == "optimal"):
+        filename = arguments[2] if arguments_length > 3 else "rushhour.db"
+        table = DistanceTable(filename)
+        result = table.solve(board)
+        table.close()
+        out.write(render_result(result, level, compact, result.depth))
+
+    elif (command == "cache"):
+        cache = solution_cache(options.cache or CACHE_FILE)
+        out.write(json.dumps(cache.to_dict(), indent=2) + "\n")
 
     else:
-        print("\nInvalid command.")
-        print("Valid commands: print | done | next\n")
+        out.write(USAGE)
+    return out.getvalue()
+
+
+# ----------------------------------------------------------------------------------
+# Solver Server - Runs command lines for clients of a local socket
+# ----------------------------------------------------------------------------------
+SERVER_SOCKET = os.environ.get("RUSHHOUR_SOCKET", "/tmp/rushhour.sock")
+CANCELLED = "cancelled"
+REFUSED = "refused"
+REPLY_MARGIN = 0.05
+# Commands the server runs for clients: searches that read nothing but the
+# board and write no files
+SERVE_COMMANDS = ("print", "done", "next", "random", "walks", "bfs", "bibfs", "astar",
+                  "idastar", "pdb", "wastar", "beam", "stats")
+
+
+# FUNCTION - Opens the solution cache once when a server worker starts
+def warm_worker(cache):
+    if cache is not None:
+        solution_cache(cache)
+
+
+# FUNCTION - Runs a batch of (key, arguments, deadline) requests in a worker
+# process. A request with a deadline (time.time() seconds) gets a search
+# timeout that ends REPLY_MARGIN early, so its partial result still gets back
+# before the server gives up waiting. Only SERVE_COMMANDS are run, and the
+# client cannot choose a cache file; the server's cache, if any, is used.
+def serve_batch(requests, cache=None):
+    responses = []
+    for key, arguments, deadline in requests:
+        command = arguments[0] if len(arguments) > 0 else None
+        if command not in SERVE_COMMANDS or output_options(arguments)[1].cache is not None:
+            responses.append({"id": key, "status": REFUSED,
+                              "error": "command not served: %s" % " ".join(arguments[:1])})
+            continue
+        if cache is not None:
+            arguments = arguments + ["--cache", cache]
+        if deadline is not None:
+            remaining = deadline - time.time()
+            budget = max(remaining - max(REPLY_MARGIN, remaining * 0.1), 0.001)
+            arguments = arguments + ["--timeout", "%.3f" % budget]
+        try:
+            responses.append({"id": key, "status": "ok", "output": command_line(arguments)})
+        except Exception as error:
+            responses.append({"id": key, "status": "error",
+                              "error": "%s: %s" % (type(error).__name__, error)})
+    return responses
+
+
+class SolverServer:
+    """Answers newline-delimited JSON requests over a Unix or localhost socket.
+
+    A request is {"id": ..., "argv": [command, board, options...]} with an
+    optional "timeout" in seconds; the reply carries the same id and either
+    the command's output or an error. {"cancel": id} cancels a request of the
+    same connection and {"stats": true} reports the server counters.
+    Only the read-only commands in SERVE_COMMANDS are run.
+    Requests that arrive within window seconds of each other are dispatched
+    together: the pending requests are split evenly over the free workers, at
+    most batch_size per worker, and a request is only handed to a worker once
+    one is free, so queued requests can still be cancelled or expire.
+    Workers are long-lived processes, so pattern databases and the solution
+    cache stay loaded between requests. A pool broken by a crashed worker is
+    replaced.
+    """
+
+    def __init__(self, workers=None, window=0.002, batch_size=8, cache=None):
+        self.workers = workers or os.cpu_count()
+        self.window = window
+        self.batch_size = batch_size
+        self.cache = cache
+        self.executor = self.start_workers()
+        self.pending = collections.OrderedDict()
+        self.running = {}
+        self.busy = 0
+        self.keys = itertools.count()
+        self.requests = 0
+        self.batches = 0
+        self.cancelled = 0
+        self.timeouts = 0
+
+    # FUNCTION - Returns a new pool of workers with the cache opened
+    def start_workers(self):
+        return concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=warm_worker, initargs=(self.cache,))
+
+    async def run(self, path=SERVER_SOCKET, port=None):
+        self.loop = asyncio.get_running_loop()
+        self.arrived = asyncio.Event()
+        self.slots = asyncio.Semaphore(self.workers)
+        if port is None:
+            if os.path.exists(path):
+                os.unlink(path)
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, "127.0.0.1", port)
+        dispatcher = asyncio.ensure_future(self.dispatch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            dispatcher.cancel()
+            self.executor.shutdown(cancel_futures=True)
+            if port is None and os.path.exists(path):
+                os.unlink(path)
+
+    # FUNCTION - Reads requests from one connection until it closes
+    async def handle(self, reader, writer):
+        lock = asyncio.Lock()
+        keys = {}
+        answers = set()
+
+        async def reply(response):
+            async with lock:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+            except ValueError:
+                await reply({"status": "error", "error": "invalid JSON request"})
+                continue
+
+            if "cancel" in request:
+                self.cancel(keys.get(request["cancel"]))
+            elif request.get("stats"):
+                await reply(self.to_dict())
+            else:
+                # Queue before reading on, so a cancel on the next line finds it
+                key, future = self.queue(request)
+                keys[request.get("id")] = key
+                answer = asyncio.ensure_future(
+                    self.answer(request, key, future, keys, reply))
+                answers.add(answer)
+                answer.add_done_callback(answers.discard)
+
+        # The client is gone, nobody is waiting for its answers
+        for key in keys.values():
+            self.cancel(key)
+        for answer in list(answers):
+            answer.cancel()
+        writer.close()
+
+    # FUNCTION - Queues one request, returns its key and the future of its reply
+    def queue(self, request):
+        key = next(self.keys)
+        future = self.loop.create_future()
+        timeout = request.get("timeout")
+        deadline = None if timeout is None else time.time() + timeout
+        self.pending[key] = (list(request.get("argv", [])), deadline, future)
+        self.requests += 1
+        self.arrived.set()
+        return key, future
+
+    # FUNCTION - Replies with the result of a queued request, a timeout or a
+    # cancellation
+    async def answer(self, request, key, future, keys, reply):
+        request_id = request.get("id")
+        try:
+            response = await asyncio.wait_for(asyncio.shield(future), request.get("timeout"))
+        except asyncio.TimeoutError:
+            self.pending.pop(key, None)
+            self.timeouts += 1
+            response = {"status": TIMEOUT}
+        finally:
+            if keys.get(request_id) == key:
+                del keys[request_id]
+        response["id"] = request_id
+        await reply(response)
+
+    # FUNCTION - Drops a queued request, or discards the result of a running one
+    def cancel(self, key):
+        entry = self.pending.pop(key, None) or self.running.get(key)
+        if entry is not None and not entry[2].done():
+            entry[2].set_result({"status": CANCELLED})
+            self.cancelled += 1
+
+    # FUNCTION - Hands queued requests to free workers in batches
+    async def dispatch(self):
+        while True:
+            await self.arrived.wait()
+            # Let requests that arrive together share a batch
+            await asyncio.sleep(self.window)
+            await self.slots.acquire()
+
+            # Share the queue among the free workers instead of filling one
+            free = self.workers - self.busy
+            size = min(self.batch_size, max(1, -(-len(self.pending) // free)))
+            batch = []
+            while len(self.pending) > 0 and len(batch) < size:
+                key, (arguments, deadline, future) = self.pending.popitem(last=False)
+                if future.done():
+                    continue
+                batch.append(key)
+                self.running[key] = (arguments, deadline, future)
+            if len(self.pending) == 0:
+                self.arrived.clear()
+            if len(batch) == 0:
+                self.slots.release()
+                continue
+
+            self.batches += 1
+            self.busy += 1
+            work = [(key,) + self.running[key][:2] for key in batch]
+            done = self.loop.run_in_executor(self.executor, serve_batch, work, self.cache)
+            done.add_done_callback(functools.partial(self.finish, batch, self.executor))
+
+    # FUNCTION - Resolves the requests of a finished batch
+    def finish(self, batch, executor, done):
+        self.busy -= 1
+        self.slots.release()
+        try:
+            responses = done.result()
+        except Exception as error:
+            # Every batch of a broken pool fails, the first one replaces it
+            if isinstance(error, concurrent.futures.BrokenExecutor) \
+                    and executor is self.executor:
+                executor.shutdown(wait=False)
+                self.executor = self.start_workers()
+            responses = [{"id": key, "status": "error", "error": str(error)} for key in batch]
+        for response in responses:
+            future = self.running.pop(response.pop("id"))[2]
+            if not future.done():
+                future.set_result(response)
+
+    def to_dict(self):
+        return {
+            "workers": self.workers,
+            "requests": self.requests,
+            "batches": self.batches,
+            "pending": len(self.pending),
+            "running": len(self.running),
+            "cancelled": self.cancelled,
+            "timeouts": self.timeouts,
+        }
+
+
+def serve(arguments):
+    parser = argparse.ArgumentParser(
+        prog="rushhour.py serve",
+        description="Answer rushhour.py command lines sent by client.py over a local socket.")
+    parser.add_argument("-s", "--socket", default=SERVER_SOCKET,
+                        help="Unix socket path (default $RUSHHOUR_SOCKET or %(default)s)")
+    parser.add_argument("-p", "--port", type=int, default=None,
+                        help="listen on 127.0.0.1:PORT instead of a Unix socket")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-b", "--batch-size", type=int, default=8)
+    parser.add_argument("--window", type=float, default=2.0,
+                        help="milliseconds to wait for requests to batch together")
+    parser.add_argument("--cache", nargs="?", const=CACHE_FILE, default=None,
+                        help="answer from and store into a solution cache")
+    options = parser.parse_args(arguments)
+
+    server = SolverServer(options.workers, options.window / 1000.0,
+                          options.batch_size, options.cache)
+    try:
+        asyncio.run(server.run(options.socket, options.port))
+    except KeyboardInterrupt:
+        pass
+
+
+# ----------------------------------------------------------------------------------
+# Main Function
+# ----------------------------------------------------------------------------------
+if __name__ == "__main__":
+
+    arguments_length = len(sys.argv)
+
+    if(arguments_length < 2):
+        print("\nInvalid Command.\nPlease enter atleast 1 argument.\n")
+        sys.exit()
+
+    if (sys.argv[1] == "batch"):
+        batch(sys.argv[2:])
+        sys.exit()
+
+    if (sys.argv[1] == "generate"):
+        generate(sys.argv[2:])
+        sys.exit()
+
+    if (sys.argv[1] == "serve"):
+        serve(sys.argv[2:])
+        sys.exit()
+
+    sys.stdout.write(command_line(sys.argv[1:]))
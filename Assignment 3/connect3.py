@@ -1,6 +1,7 @@
 import math
 import random
-import sys
+import argparse
+import functools
 import time
 
 
@@ -13,40 +14,127 @@ PLAYER1 = 'X'
 PLAYER2 = 'O'
 
 
+# -----------------------------------------------------------------------------------
+# Bitboard Geometry - column i, row j is bit i * rows + j (row 0 at the bottom)
+# -----------------------------------------------------------------------------------
+# FUNCTION - Returns the masks of every connect-long line on the board
+def line_masks(cols, rows, connect):
+    lines = []
+    for i in range(cols):
+        for j in range(rows):
+            for di, dj in ((1, 0), (0, 1), (1, 1), (-1, 1)):
+                ei, ej = i + di * (connect-1), j + dj * (connect-1)
+                if 0 <= ei < cols and 0 <= ej < rows:
+                    mask = 0
+                    for k in range(connect):
+                        mask |= 1 << ((i + di*k) * rows + j + dj*k)
+                    lines.append(mask)
+    return lines
+
+
+# Geometry Class - tables shared by every board of one size and connect length
+# weights[k] scores a line holding k discs of one player and none of the other.
+class Geometry:
+    __slots__ = ("cols", "rows", "connect", "cells", "full", "lines", "cell_lines",
+                 "center", "weights")
+
+    def __init__(self, cols, rows, connect):
+        self.cols = cols
+        self.rows = rows
+        self.connect = connect
+        self.cells = cols * rows
+        self.full = (1 << self.cells) - 1
+        self.lines = line_masks(cols, rows, connect)
+        self.cell_lines = [[line for line in self.lines if line >> k & 1] for k in range(self.cells)]
+        # Columns from the middle outwards, the static move order
+        self.center = sorted(range(cols), key=lambda c: abs(2*c - (cols-1)))
+        self.weights = [0] + [5 ** (k-1) for k in range(1, connect)] + [0]
+
+
+# FUNCTION - Returns the (cached) geometry of a board size
+@functools.lru_cache(maxsize=None)
+def geometry(cols, rows, connect):
+    if connect < 2 or (connect > cols and connect > rows):
+        raise ValueError("cannot connect %d on a %dx%d board" % (connect, cols, rows))
+    return Geometry(cols, rows, connect)
+
+
+# Connect3 Board - one occupancy mask per label and a disc count per column
+# A board string ("col|col|...", bottom row first) sets the size by itself.
 class Connect3Board:
 
-    def __init__(self, string=None):
-        if string is not None:
-            self.b = [list(line) for line in string.split('|')]
-        else:
-            self.b = [list(EMPTY * ROWS) for i in range(COLS)]
+    def __init__(self, string=None, cols=COLS, rows=ROWS, connect=CONNECT):
+        columns = string.split('|') if string is not None else None
+        if columns is not None:
+            cols, rows = len(columns), len(columns[0])
+        self.g = geometry(cols, rows, connect)
+        self.cols = cols
+        self.rows = rows
+        self.bits = {}
+        self.occupied = 0
+        self.heights = [0] * cols
+        self.count = 0
+        if columns is not None:
+            for i, line in enumerate(columns):
+                for j, label in enumerate(line):
+                    if label != EMPTY:
+                        self.put(i, j, label)
 
     def compact_string(self):
-        return '|'.join([''.join(row) for row in self.b])
+        return '|'.join([''.join([self.get(i, j) for j in range(self.rows)]) for i in range(self.cols)])
 
     def clone(self):
-        return Connect3Board(self.compact_string())
+        board = Connect3Board.__new__(Connect3Board)
+        board.g = self.g
+        board.cols = self.cols
+        board.rows = self.rows
+        board.bits = dict(self.bits)
+        board.occupied = self.occupied
+        board.heights = list(self.heights)
+        board.count = self.count
+        return board
+
+    # Packed position; boards holding only PLAYER1/PLAYER2 discs never collide
+    def key(self):
+        bits, cells = self.bits, self.g.cells
+        return bits.get(PLAYER1, 0) | (bits.get(PLAYER2, 0) | self.occupied << cells) << cells
 
     def get(self, i, j):
-        return self.b[i][j] if i >= 0 and i < COLS and j >= 0 and j < ROWS else None
+        if i < 0 or i >= self.cols or j < 0 or j >= self.rows:
+            return None
+        bit = 1 << (i * self.rows + j)
+        if self.occupied & bit:
+            for label, mask in self.bits.items():
+                if mask & bit:
+                    return label
+        return EMPTY
 
     def row(self, j):
-        return [self.get(i, j) for i in range(COLS)]
+        return [self.get(i, j) for i in range(self.cols)]
 
     def put(self, i, j, val):
-        self.b[i][j] = val
+        bit = 1 << (i * self.rows + j)
+        if self.occupied & bit:
+            for label in list(self.bits):
+                self.bits[label] &= ~bit
+                if not self.bits[label]:
+                    del self.bits[label]
+            self.occupied &= ~bit
+            self.count -= 1
+        if val != EMPTY:
+            self.bits[val] = self.bits.get(val, 0) | bit
+            self.occupied |= bit
+            self.count += 1
+        column = (self.occupied >> (i * self.rows)) & ((1 << self.rows) - 1)
+        self.heights[i] = column.bit_length()
         return self
 
     def empties(self):
-        return self.compact_string().count(EMPTY)
+        return self.g.cells - self.count
 
     def first_empty(self, i):
-        j = ROWS - 1
-        if self.get(i, j) != EMPTY:
-            return None
-        while j >= 0 and self.get(i, j) == EMPTY:
-            j -= 1
-        return j+1
+        j = self.heights[i]
+        return j if j < self.rows else None
 
     def place(self, i, label):
         j = self.first_empty(i)
@@ -55,37 +143,51 @@ class Connect3Board:
         return self
 
     def equals(self, board):
-        return self.compact_string() == board.compact_string()
+        return self.g is board.g and self.bits == board.bits
 
     def next(self, label):
         boards = []
-        for i in range(COLS):
-            j = self.first_empty(i)
-            if j is not None:
+        for i in range(self.cols):
+            if self.heights[i] < self.rows:
                 board = self.clone()
-                board.put(i, j, label)
+                board.drop(i, label)
                 boards.append(board)
         return boards
 
-    def _winner_test(self, label, i, j, di, dj):
-        for _ in range(CONNECT-1):
-            i += di
-            j += dj
-            if self.get(i, j) != label:
-                return False
-        return True
+    # Search API - drops a disc in place and returns the end state it causes
+    # (label when it completes a line through the new disc, TIE when the board
+    # fills up, None otherwise). drop() expects a column that is not full.
+    def drop(self, i, label):
+        j = self.heights[i]
+        k = i * self.rows + j
+        bit = 1 << k
+        mask = self.bits.get(label, 0) | bit
+        self.bits[label] = mask
+        self.occupied |= bit
+        self.heights[i] = j + 1
+        self.count += 1
+        for line in self.g.cell_lines[k]:
+            if mask & line == line:
+                return label
+        return TIE if self.count == self.g.cells else None
+
+    # Takes back the top disc of column i, dropped by label
+    def undrop(self, i, label):
+        j = self.heights[i] - 1
+        bit = 1 << (i * self.rows + j)
+        self.bits[label] &= ~bit
+        if not self.bits[label]:
+            del self.bits[label]
+        self.occupied &= ~bit
+        self.heights[i] = j
+        self.count -= 1
 
     def winner(self):
-        for i in range(COLS):
-            for j in range(ROWS):
-                label = self.get(i, j)
-                if label != EMPTY:
-                    if self._winner_test(label, i, j, +1, 0) \
-                            or self._winner_test(label, i, j, 0, +1) \
-                            or self._winner_test(label, i, j, +1, +1) \
-                            or self._winner_test(label, i, j, -1, +1):
-                        return label
-        return TIE if self.empties() == 0 else None
+        for label, mask in self.bits.items():
+            for line in self.g.lines:
+                if mask & line == line:
+                    return label
+        return TIE if self.occupied == self.g.full else None
 
     def __str__(self):
         return stringify_boards([self])
@@ -95,19 +197,74 @@ def stringify_boards(boards):
     if len(boards) > 6:
         return stringify_boards(boards[0:6]) + '\n' + stringify_boards(boards[6:])
     else:
-        s = ' '.join([' ' + ('-' * COLS) + ' '] * len(boards)) + '\n'
-        for j in range(ROWS):
+        width, height = boards[0].cols, boards[0].rows
+        s = ' '.join([' ' + ('-' * width) + ' '] * len(boards)) + '\n'
+        for j in range(height):
             rows = []
             for board in boards:
-                rows.append('|' + ''.join(board.row(ROWS-1-j)) + '|')
+                rows.append('|' + ''.join(board.row(height-1-j)) + '|')
             s += ' '.join(rows) + '\n'
-        s += ' '.join([' ' + ('-' * COLS) + ' '] * len(boards))
+        s += ' '.join([' ' + ('-' * width) + ' '] * len(boards))
         return s
 
+# -----------------------------------------------------------------------------------
+# Transposition Table
+# -----------------------------------------------------------------------------------
+EXACT = 0
+LOWER = 1
+UPPER = 2
+TABLE_SIZE = 65521  # prime, so packed integer keys spread over every slot
+
+
+# Transposition Table - fixed number of slots, one entry per slot
+# Entries are (key, value, move, depth, bound, generation). A slot is replaced
+# when it is empty, holds the same position, was written by an earlier search,
+# or was searched no deeper than the new entry.
+class TranspositionTable:
+    def __init__(self, size=TABLE_SIZE):
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key):
+        self.probes += 1
+        entry = self.slots[hash(key) % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, value, move, depth, bound):
+        index = hash(key) % self.size
+        entry = self.slots[index]
+        if entry is None or entry[0] == key or entry[5] != self.generation \
+                or entry[3] <= depth:
+            self.slots[index] = (key, value, move, depth, bound, self.generation)
+            self.stores += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+
+    def __len__(self):
+        return sum(1 for entry in self.slots if entry is not None)
+
+    def __str__(self):
+        rate = 100.0 * self.hits / self.probes if self.probes else 0.0
+        return "%d entries, %d/%d probes hit (%.1f%%)" % (len(self), self.hits, self.probes, rate)
+
 # -----------------------------------------------------------------------------------
 # AI Players Implementation
 # -----------------------------------------------------------------------------------
 
+EVALUATION_LIMIT = 900
+
+
 # Player Class
 class Player:
     def __init__(self, label):
@@ -123,9 +280,26 @@ class RandomPlayer(Player):
         pick = random.randint(0, len(moves)-1)
         return moves[pick]
 
+# Human Player - reads a column (1 = leftmost) from the terminal
+class HumanPlayer(Player):
+    def __init__(self, label):
+        super().__init__(label)
+
+    def play(self, board):
+        print(board)
+        while True:
+            answer = input("Column for %s (1-%d): " % (self.label, board.cols)).strip()
+            if answer.isdigit() and 1 <= int(answer) <= board.cols \
+                    and board.first_empty(int(answer) - 1) is not None:
+                return board.clone().place(int(answer) - 1, self.label)
+
 # Minimax player
+# Every node returns the best child value times the reducer, so a stored value
+# only depends on the position below it and is valid wherever it is reached.
+# Searches run to the end of the game (depth = empty cells) unless a depth
+# limit is given; positions at the limit are scored by evaluate().
 class MinimaxPlayer(Player):
-    def __init__(self, label):
+    def __init__(self, label, table=None, depth=None):
         super().__init__(label)
         # Define Opponent
         self.opponent = PLAYER1
@@ -133,41 +307,68 @@ class MinimaxPlayer(Player):
             self.opponent = PLAYER2
         # Tree depth reducer
         self.reducer = 0.7
+        # Transposition table, kept across moves (pass one in to share it across games)
+        self.table = table if table is not None else TranspositionTable()
+        # Depth limit in plies, None searches to the end of the game
+        self.depth = depth
 
-    def maximize(self,board):
-        # Check end state
-        endState = board.winner()
-        if self.terminal_test(endState):
-            return None, self.utility(endState) * self.reducer
+    def key(self, board, label):
+        return board.key() << 2 | (label == PLAYER1) << 1 | (self.label == PLAYER1)
 
-        # Create possible actions to maximize
-        move, value = None, -99999
-        actions = board.next(self.label)
+    def maximize(self, board, depth):
+        if depth == 0:
+            return None, self.evaluate(board) * self.reducer
 
-        # Compute minimax for each action
-        for action in actions:
-            _, checkValue = self.minimize(action)
+        # Look up the position
+        key = self.key(board, self.label)
+        entry = self.table.probe(key)
+        if entry is not None and entry[3] >= depth and entry[4] == EXACT:
+            return entry[2], entry[1]
+
+        # Compute minimax for each possible action, undoing it afterwards
+        move, value = None, -99999
+        for column in range(board.cols):
+            if board.heights[column] == board.rows:
+                continue
+            endState = board.drop(column, self.label)
+            if self.terminal_test(endState):
+                checkValue = self.utility(endState) * self.reducer
+            else:
+                _, checkValue = self.minimize(board, depth - 1)
+            board.undrop(column, self.label)
             if checkValue > value:
-                move, value = action, checkValue * self.reducer
+                move, value = column, checkValue
 
+        value *= self.reducer
+        self.table.store(key, value, move, depth, EXACT)
         return move, value
 
-    def minimize(self, board):
-        # Check end state
-        endState = board.winner()
-        if self.terminal_test(endState):
-            return None, self.utility(endState) * self.reducer
+    def minimize(self, board, depth):
+        if depth == 0:
+            return None, self.evaluate(board) * self.reducer
 
-        # Create possible actions to minimize
+        # Look up the position
+        key = self.key(board, self.opponent)
+        entry = self.table.probe(key)
+        if entry is not None and entry[3] >= depth and entry[4] == EXACT:
+            return entry[2], entry[1]
+
+        # Compute minimax for each possible action, undoing it afterwards
         move, value = None, 99999
-        actions = board.next(self.opponent)
-        
-        # Compute minimax for each action
-        for action in actions:
-            _, checkValue = self.maximize(action)
+        for column in range(board.cols):
+            if board.heights[column] == board.rows:
+                continue
+            endState = board.drop(column, self.opponent)
+            if self.terminal_test(endState):
+                checkValue = self.utility(endState) * self.reducer
+            else:
+                _, checkValue = self.maximize(board, depth - 1)
+            board.undrop(column, self.opponent)
             if checkValue < value:
-                move, value = action, checkValue * self.reducer
+                move, value = column, checkValue
 
+        value *= self.reducer
+        self.table.store(key, value, move, depth, EXACT)
         return move, value
 
     def terminal_test(self, endState):
@@ -183,67 +384,269 @@ class MinimaxPlayer(Player):
         else:
             return -1000
 
+    # Static value of a position: every line still open to only one player
+    # scores the weight of its disc count, for this player or against. The
+    # value stays below a win so a found win always beats it.
+    def evaluate(self, board):
+        mine = board.bits.get(self.label, 0)
+        theirs = board.bits.get(self.opponent, 0)
+        weights = board.g.weights
+        score = 0
+        for line in board.g.lines:
+            if mine & line:
+                if not theirs & line:
+                    score += weights[bin(mine & line).count("1")]
+            elif theirs & line:
+                score -= weights[bin(theirs & line).count("1")]
+        return max(-EVALUATION_LIMIT, min(EVALUATION_LIMIT, score))
+
+    def horizon(self, board):
+        depth = board.empties()
+        return depth if self.depth is None else min(self.depth, depth)
+
+    # Searches a private copy in place; it is restored before the move is placed
     def play(self, board):
-        move, _ = self.maximize(board)
-        return move
+        self.table.new_search()
+        board = board.clone()
+        move, _ = self.maximize(board, self.horizon(board))
+        return board.place(move, self.label)
 
-#Alpha Beta Player
-class MinimaxAlphaBetaPlayer(MinimaxPlayer):
-    def __init__(self, label):
-        super().__init__(label)
-    
-    def maximize(self,board, alpha, beta):
-        # Check end state
-        endState = board.winner()
-        if self.terminal_test(endState):
-            return None, self.utility(endState) * self.reducer
+# -----------------------------------------------------------------------------------
+# Search Budget and Stats
+# -----------------------------------------------------------------------------------
+CHECK_EVERY = 256
 
-        # Create possible actions to maximize
-        move, value = None, -99999
-        actions = board.next(self.label)
 
-        # Compute minimax for each action
-        for action in actions:
-            _, checkValue = self.minimize(action, alpha, beta)
+# Raised inside a search when its time or node budget runs out
+class SearchAborted(Exception):
+    pass
+
+
+# Search Stats - counters of one move: cutoff rate is the share of searched
+# nodes that were cut off, first-move rate the share of cutoffs made by the
+# first column tried (the higher, the better the move ordering)
+class SearchStats:
+    def __init__(self):
+        self.nodes = 0
+        self.interior = 0
+        self.cutoffs = 0
+        self.first = 0
+        self.depth = 0
+        self.pv = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def cutoff_rate(self):
+        return 100.0 * self.cutoffs / self.interior if self.interior else 0.0
+
+    def first_rate(self):
+        return 100.0 * self.first / self.cutoffs if self.cutoffs else 0.0
+
+    def __str__(self):
+        return "depth %d, %d nodes, %.1f%% cut, %.1f%% on first move, pv %s" % (
+            self.depth, self.nodes, self.cutoff_rate(), self.first_rate(),
+            ''.join(str(c) for c in self.pv))
+
+#Alpha Beta Player
+# The window is carried in the frame of the returned value, so children search
+# (alpha, beta) divided by the reducer. Stored bounds follow fail-soft rules:
+# at or below alpha an upper bound, at or above beta a lower bound.
+# play() deepens one ply at a time until the game end or the budget (timeout
+# seconds, nodes) runs out, and plays the best move of the last finished
+# depth. Columns are tried in the order: table move, previous principal
+# variation, two killer moves of the ply, then history score and center first.
+class MinimaxAlphaBetaPlayer(MinimaxPlayer):
+    def __init__(self, label, table=None, timeout=None, nodes=None, depth=None):
+        super().__init__(label, table, depth)
+        self.timeout = timeout
+        self.nodes = nodes
+        self.stats = SearchStats()
+        self.history = [[], []]
+        self.killers = []
+        self.pv = []
+        self.root = 0
+        self.deadline = None
+        self.ready = False
+
+    def lookup(self, key, depth, alpha, beta):
+        entry = self.table.probe(key)
+        if entry is None:
+            return None, None
+        if entry[3] >= depth:
+            value, bound = entry[1], entry[4]
+            if bound == EXACT or (bound == LOWER and value >= beta) \
+                    or (bound == UPPER and value <= alpha):
+                return entry, value
+        return entry, None
+
+    def record(self, key, value, move, depth, alpha, beta):
+        if value <= alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(key, value, move, depth, bound)
+
+    def spent(self):
+        stats = self.stats
+        stats.nodes += 1
+        if not self.ready:
+            return False
+        if self.nodes is not None and stats.nodes >= self.nodes:
+            return True
+        return self.deadline is not None and stats.nodes % CHECK_EVERY == 0 \
+            and time.perf_counter() > self.deadline
+
+    def order(self, board, ply, side, first):
+        heights, rows = board.heights, board.rows
+        history = self.history[side]
+        columns = [c for c in board.g.center if heights[c] < rows]
+        columns.sort(key=lambda c: -history[c*rows + heights[c]])
+        promoted = self.killers[ply][::-1]
+        if ply < len(self.pv):
+            promoted.append(self.pv[ply])
+        promoted.append(first)
+        for column in promoted:
+            if column in columns:
+                columns.remove(column)
+                columns.insert(0, column)
+        return columns
+
+    def cutoff(self, board, ply, side, column, depth, tried):
+        stats = self.stats
+        stats.cutoffs += 1
+        if tried == 1:
+            stats.first += 1
+        killers = self.killers[ply]
+        if killers[0] != column:
+            killers[1] = killers[0]
+            killers[0] = column
+        self.history[side][column*board.rows + board.heights[column]] += depth * depth
+
+    def maximize(self, board, depth, alpha, beta):
+        if self.spent():
+            raise SearchAborted()
+        if depth == 0:
+            return None, self.evaluate(board) * self.reducer
+
+        # Look up the position
+        key = self.key(board, self.label)
+        entry, known = self.lookup(key, depth, alpha, beta)
+        if known is not None:
+            return entry[2], known
+
+        # Compute minimax for each possible action, best guesses first
+        ply = self.root - depth
+        self.stats.interior += 1
+        move, value, tried = None, -99999, 0
+        a, b = alpha / self.reducer, beta / self.reducer
+        for column in self.order(board, ply, 0, entry and entry[2]):
+            tried += 1
+            endState = board.drop(column, self.label)
+            if self.terminal_test(endState):
+                checkValue = self.utility(endState) * self.reducer
+            else:
+                _, checkValue = self.minimize(board, depth - 1, a, b)
+            board.undrop(column, self.label)
             if checkValue > value:
-                move, value = action, checkValue * self.reducer
-                alpha = max(alpha, value)
+                move, value = column, checkValue
+                a = max(a, value)
             # Break for beta
-            if beta <= alpha:
+            if b <= a:
+                self.cutoff(board, ply, 0, column, depth, tried)
                 break
 
+        value *= self.reducer
+        self.record(key, value, move, depth, alpha, beta)
         return move, value
-    
-    def minimize(self, board, alpha, beta):
-        # Check end state
-        endState = board.winner()
-        if self.terminal_test(endState):
-            return None, self.utility(endState) * self.reducer
 
-        # Create possible actions to minimize
-        move, value = None, 99999
-        actions = board.next(self.opponent)
-        
-        # Compute minimax for each action
-        for action in actions:
-            _, checkValue = self.maximize(action, alpha, beta)
+    def minimize(self, board, depth, alpha, beta):
+        if self.spent():
+            raise SearchAborted()
+        if depth == 0:
+            return None, self.evaluate(board) * self.reducer
+
+        # Look up the position
+        key = self.key(board, self.opponent)
+        entry, known = self.lookup(key, depth, alpha, beta)
+        if known is not None:
+            return entry[2], known
+
+        # Compute minimax for each possible action, best guesses first
+        ply = self.root - depth
+        self.stats.interior += 1
+        move, value, tried = None, 99999, 0
+        a, b = alpha / self.reducer, beta / self.reducer
+        for column in self.order(board, ply, 1, entry and entry[2]):
+            tried += 1
+            endState = board.drop(column, self.opponent)
+            if self.terminal_test(endState):
+                checkValue = self.utility(endState) * self.reducer
+            else:
+                _, checkValue = self.maximize(board, depth - 1, a, b)
+            board.undrop(column, self.opponent)
             if checkValue < value:
-                move, value = action, checkValue * self.reducer
-                beta = min(beta, value)
+                move, value = column, checkValue
+                b = min(b, value)
             # Break for alpha
-            if beta <= alpha:
+            if b <= a:
+                self.cutoff(board, ply, 1, column, depth, tried)
                 break
 
+        value *= self.reducer
+        self.record(key, value, move, depth, alpha, beta)
         return move, value
-    
+
+    # FUNCTION - Follows the table moves from the root for at most depth plies
+    def principal_variation(self, board, depth):
+        pv, label, other = [], self.label, self.opponent
+        while len(pv) < depth:
+            entry = self.table.probe(self.key(board, label))
+            if entry is None or entry[2] is None:
+                break
+            pv.append(entry[2])
+            if board.drop(entry[2], label) is not None:
+                break
+            label, other = other, label
+        for k in range(len(pv) - 1, -1, -1):
+            board.undrop(pv[k], self.label if k % 2 == 0 else self.opponent)
+        return pv
+
+    # Iterative deepening driver, returns the best column and its value
+    def search(self, board):
+        self.table.new_search()
+        self.stats = SearchStats()
+        cells = board.g.cells
+        self.killers = [[None, None] for _ in range(cells + 1)]
+        for side, history in enumerate(self.history):
+            self.history[side] = [h >> 1 for h in history] if len(history) == cells else [0] * cells
+        self.pv = []
+        self.deadline = None if self.timeout is None else self.stats.started + self.timeout
+        self.ready = False
+        move, value = None, None
+        for depth in range(1, self.horizon(board) + 1):
+            self.root = depth
+            # An aborted iteration leaves its discs behind, so each one searches a copy
+            try:
+                move, value = self.maximize(board.clone(), depth, -99999, 99999)
+            except SearchAborted:
+                break
+            self.ready = True
+            self.stats.depth = depth
+            self.pv = self.principal_variation(board, depth)
+        self.stats.pv = self.pv
+        self.stats.elapsed = time.perf_counter() - self.stats.started
+        return move, value
+
     def play(self, board):
-        move, _ = self.maximize(board,-99999, 99999)
-        return move  
+        move, _ = self.search(board)
+        return board.clone().place(move, self.label)
 
 
 # Game AI Class
 class GameAI:
-    def __init__(self, board, mode):
+    def __init__(self, board, mode, table=None, timeout=None, nodes=None, depth=None):
         self.board = board
         self.player1 = None
         self.player2 = None
@@ -254,12 +657,17 @@ class GameAI:
             self.player2 = RandomPlayer(PLAYER2)
         if mode == 'minimax':
             self.player1 = RandomPlayer(PLAYER1)
-            self.player2 = MinimaxPlayer(PLAYER2)
+            self.player2 = MinimaxPlayer(PLAYER2, table, depth)
             self.timer = True
             self.AIname = "Minimax Player"
         if mode == 'alphabeta':
             self.player1 = RandomPlayer(PLAYER1)
-            self.player2 = MinimaxAlphaBetaPlayer(PLAYER2)
+            self.player2 = MinimaxAlphaBetaPlayer(PLAYER2, table, timeout, nodes, depth)
+            self.timer = True
+            self.AIname = "AlphaBeta Player"
+        if mode == 'human':
+            self.player1 = HumanPlayer(PLAYER1)
+            self.player2 = MinimaxAlphaBetaPlayer(PLAYER2, table, timeout, nodes, depth)
             self.timer = True
             self.AIname = "AlphaBeta Player"
     
@@ -268,6 +676,7 @@ class GameAI:
         gamePlay = [self.board]
         winner = None
         timer = []
+        searches = []
 
         # Game simulation
         while True:
@@ -287,6 +696,8 @@ class GameAI:
             if self.timer:
                 end = time.time()
                 timer.append(round(end-start, 3))     
+                if isinstance(self.player2, MinimaxAlphaBetaPlayer):
+                    searches.append(self.player2.stats)
 
             if self.board.winner() != None:
                 break
@@ -305,31 +716,60 @@ class GameAI:
             print("Time by",self.AIname,"in seconds:")
             for _time in timer:
                 print(str(_time) + "secs", end=" | ")
+            print("\nTransposition table:", self.player2.table, end="")
+            for move, stats in enumerate(searches):
+                print("\nMove %d search: %s" % (move + 1, stats), end="")
         print("\n")
 
 # Main function
-if __name__ == "__main__":        
+# Usage: connect3.py cmd [board] [games] [options]; games > 1 replays from the
+# same board and shares one transposition table across all of them.
+# -t and -n bound every alphabeta move, -d limits both minimax players.
+# --cols/--rows/--connect size an empty board (a board string sets its own
+# size); boards too big to search to the end get a default limit.
+EXHAUSTIVE_CELLS = 16
+DEFAULT_TIME = 1.0
+DEFAULT_DEPTH = 5
 
-    if len(sys.argv) > 1:
-        cmd = sys.argv[1]
-        board = Connect3Board(sys.argv[2] if len(sys.argv) > 2 else None)
+if __name__ == "__main__":        
 
-        if cmd == 'print':
-            print(board)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cmd")
+    parser.add_argument("args", nargs="*")
+    parser.add_argument("-t", "--time", type=float, default=None)
+    parser.add_argument("-n", "--nodes", type=int, default=None)
+    parser.add_argument("-d", "--depth", type=int, default=None)
+    parser.add_argument("--cols", type=int, default=COLS)
+    parser.add_argument("--rows", type=int, default=ROWS)
+    parser.add_argument("--connect", type=int, default=CONNECT)
+    options = parser.parse_args()
+
+    cmd = options.cmd
+    args = options.args
+    games = 1
+    if args and args[-1].isdigit():
+        games = int(args.pop())
+    try:
+        board = Connect3Board(args[0] if args else None, options.cols, options.rows, options.connect)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if board.g.cells > EXHAUSTIVE_CELLS and options.time is None \
+            and options.nodes is None and options.depth is None:
+        if cmd == 'minimax':
+            options.depth = DEFAULT_DEPTH
+        else:
+            options.time = DEFAULT_TIME
 
-        if cmd == 'next':
-            boards = board.next('o')
-            print(stringify_boards(boards))
+    if cmd == 'print':
+        print(board)
 
-        if cmd == 'random':
-            gameAI = GameAI(board, "random")
-            gameAI.gameplay()
-
-        if cmd == 'minimax':
-            gameAI = GameAI(board, "minimax")
-            gameAI.gameplay()
+    if cmd == 'next':
+        boards = board.next('o')
+        print(stringify_boards(boards))
 
-        if cmd == 'alphabeta':
-            gameAI =  GameAI(board, "alphabeta")
+    if cmd in ('random', 'minimax', 'alphabeta', 'human'):
+        table = TranspositionTable()
+        for _ in range(games):
+            gameAI = GameAI(board.clone(), cmd, table, options.time, options.nodes, options.depth)
             gameAI.gameplay()
-    
\ No newline at end of file
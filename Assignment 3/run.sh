@@ -1,6 +1,6 @@
 #!/bin/sh
 if [ "$#" -gt 1 ]; then
-    python3 connect3.py "$1" "$2"
+    python3 connect3.py "$@"
 else
     python3 connect3.py "$1"
 fi